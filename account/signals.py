@@ -1,8 +1,9 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from account.models import Profile
+from utils.authentication import forget_user_active
 
 User = settings.AUTH_USER_MODEL
 
@@ -11,3 +12,10 @@ User = settings.AUTH_USER_MODEL
 def create_profile(sender, created, instance, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_active(sender, instance, **kwargs):
+    # the token only views check it (ActiveTokenUserAuthentication)
+    forget_user_active(instance.id)
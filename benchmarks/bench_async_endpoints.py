@@ -0,0 +1,185 @@
+"""
+    Many concurrent clients reading their cart, adding to it and listing their orders.
+    Compares the sync views behind a WSGI thread pool (one request per thread, like gunicorn gthread)
+    with the same sync views and with the async views on the ASGI handler (one event loop).
+    Requests go through django's WSGI and ASGI handlers in process, no sockets, against a throwaway test database.
+    run from the project root: python -m benchmarks.bench_async_endpoints
+"""
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'karisma_shop.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test.client import FakePayload, RequestFactory  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from cart.models import Cart, Order  # noqa: E402
+from product.models import Product  # noqa: E402
+from utils.pooled_postgresql.base import pool_stats  # noqa: E402
+
+USERS = 50
+CONNECTIONS = 64  # requests in flight at any time
+REQUESTS = 1000  # per endpoint and deployment
+WSGI_THREADS = 8
+ORDERS_PER_USER = 20
+
+wsgi_application = get_wsgi_application()
+asgi_application = get_asgi_application()
+
+SYNC_PATHS = {
+    'cart': ('GET', '/api/cart/'),
+    'add to cart': ('POST', '/api/manage-cart/'),
+    'order list': ('GET', '/api/orders-list/?limit=10'),
+}
+ASYNC_PATHS = {
+    'cart': ('GET', '/api/async/cart/'),
+    'add to cart': ('POST', '/api/async/manage-cart/'),
+    'order list': ('GET', '/api/async/orders-list/?limit=10'),
+}
+
+
+def prepare():
+    products = [Product.objects.create(title=f'p{i}', slug=f'p{i}', base_price=1000 + i) for i in range(10)]
+    tokens = []
+    for index in range(USERS):
+        user = get_user_model().objects.create(username=f'client{index}')
+        user.get_initial_cart().add_items({product.id: 1 for product in products[:3]})
+        for _ in range(ORDERS_PER_USER):
+            Order.objects.create(user=user, step=Cart.StepChoices.PENDING, items_total=3000, total_after_discount=3000,
+                                 grand_total=3000)
+        tokens.append(f'Bearer {RefreshToken.for_user(user=user).access_token}')
+    return products, tokens
+
+
+def summary(latencies, elapsed):
+    latencies.sort()
+    return {
+        'requests/s': len(latencies) / elapsed,
+        'p50 ms': statistics.median(latencies) * 1000,
+        'p95 ms': latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def request_parts(method, path, index, products, tokens):
+    path, _, query_string = path.partition('?')
+    body = json.dumps({'product': products[index % len(products)].id}).encode() if method == 'POST' else b''
+    return path, query_string, tokens[index % USERS], body
+
+
+def run_wsgi(paths, name, products, tokens):
+    # what a threaded WSGI server does: environ in, iterate and close() the response
+    method, path = paths[name]
+    environ_factory = RequestFactory()
+    latencies = []
+
+    def call(index, queued):
+        request_path, query_string, token, body = request_parts(method, path, index, products, tokens)
+        environ = environ_factory._base_environ(
+            REQUEST_METHOD=method, PATH_INFO=request_path, QUERY_STRING=query_string, HTTP_AUTHORIZATION=token,
+            CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(body)), **{'wsgi.input': FakePayload(body)},
+        )
+        statuses = []
+        response = wsgi_application(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        assert statuses[0].startswith('200'), statuses
+        # from the moment the client sent it, the time waiting for a free thread included
+        latencies.append(time.perf_counter() - queued)
+
+    with ThreadPoolExecutor(WSGI_THREADS) as pool:
+        started = time.perf_counter()
+        in_flight = threading.Semaphore(CONNECTIONS)
+        futures = []
+        for index in range(REQUESTS):
+            in_flight.acquire()
+            future = pool.submit(call, index, time.perf_counter())
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+    return summary(latencies, elapsed)
+
+
+def run_asgi(paths, name, products, tokens):
+    # what an ASGI server does: one event loop, a scope and the body per request
+    method, path = paths[name]
+    latencies = []
+
+    async def call(index, in_flight):
+        request_path, query_string, token, body = request_parts(method, path, index, products, tokens)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+            'method': method, 'path': request_path, 'query_string': query_string.encode(),
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+            'headers': [(b'host', b'testserver'), (b'authorization', token.encode()),
+                        (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        }
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async with in_flight:
+            started = time.perf_counter()
+            await asgi_application(scope, receive, send)
+            assert statuses == [200], statuses
+            latencies.append(time.perf_counter() - started)
+
+    async def main():
+        in_flight = asyncio.Semaphore(CONNECTIONS)
+        started = time.perf_counter()
+        await asyncio.gather(*(call(index, in_flight) for index in range(REQUESTS)))
+        return time.perf_counter() - started
+
+    return summary(latencies, asyncio.run(main()))
+
+
+def main():
+    products, tokens = prepare()
+    deployments = (
+        (f'wsgi, {WSGI_THREADS} threads', run_wsgi, SYNC_PATHS),
+        ('asgi, sync views', run_asgi, SYNC_PATHS),
+        ('asgi, async views', run_asgi, ASYNC_PATHS),
+    )
+    for name in SYNC_PATHS:
+        print(name)
+        for deployment, run, paths in deployments:
+            cache.clear()
+            # warm up: builds the cached carts, opens the connections
+            run(paths, name, products, tokens)
+            stats = run(paths, name, products, tokens)
+            print(f'  {deployment:<22} ' + '  '.join(f'{key} {value:8.1f}' for key, value in stats.items()))
+    if hasattr(connection, 'pooled'):
+        print('database pool', pool_stats())
+
+
+if __name__ == '__main__':
+    setup_test_environment()  # lets the test clients in (ALLOWED_HOSTS)
+    test_database = connection.creation.create_test_db(verbosity=0)
+    for alias in settings.REPLICA_DATABASES:
+        # like the test runner does with TEST MIRROR
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        main()
+    finally:
+        connection.creation.destroy_test_db(test_database, verbosity=0)
@@ -0,0 +1,42 @@
+"""
+    Formatting the finalized_at column of a 100 row order page.
+    run from the project root: python -m benchmarks.bench_persian_datetime
+"""
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import pytz
+from khayyam import JalaliDatetime
+
+from utils.func import PersianDateTime
+
+ROWS = 100
+REPEAT = 200
+
+
+def reference_persian_datetime(date: datetime) -> str:
+    # PersianDateTime before JalaliFormatter
+    return str(JalaliDatetime(date.astimezone(tz=pytz.timezone('Asia/Tehran'))))
+
+
+def main():
+    rnd = random.Random(0)
+    now = datetime.now(tz=pytz.utc)
+    # an order history page: rows spread over the last few months
+    page = [now - timedelta(seconds=rnd.randrange(90 * 24 * 3600)) for _ in range(ROWS)]
+    assert [PersianDateTime(value) for value in page] == [reference_persian_datetime(value) for value in page]
+
+    cases = (
+        ('khayyam per row', lambda: [reference_persian_datetime(value) for value in page]),
+        ('PersianDateTime per row', lambda: [PersianDateTime(value) for value in page]),
+    )
+    baseline = None
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=REPEAT, repeat=5)) / REPEAT
+        baseline = baseline or seconds
+        print(f'{name:<25} {seconds * 1000:8.3f} ms / page   x{baseline / seconds:5.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+    Autocomplete over a synthetic catalog: rebuild time, memory and per-keystroke latency.
+    run from the project root: python -m benchmarks.bench_prefix_index
+"""
+import random
+import timeit
+
+from utils.prefix_index import PrefixIndex
+
+PRODUCTS = 200_000
+WORDS = ['گوشی', 'موبایل', 'سامسونگ', 'شیائومی', 'قاب', 'هندزفری', 'بلوتوث', 'کابل', 'شارژر', 'لپ', 'تاپ',
+         'ایسوس', 'لنوو', 'مانیتور', 'کیبورد', 'ماوس', 'بی', 'سیم', 'هدفون', 'اسپیکر', 'galaxy', 'redmi', 'pro']
+QUERIES = ['گ', 'گو', 'گوش', 'گوشی', 'سامس', 'ga', 'galaxy', 'هندز', 'لپ', 'zz']
+
+
+def main():
+    rnd = random.Random(0)
+    rows = []
+    for id_ in range(1, PRODUCTS + 1):
+        title = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 5))) + f' مدل {id_}'
+        rows.append((id_, (title, title.replace(' ', '-'))))
+
+    index = PrefixIndex()
+    index.build(rows)
+    stats = index.stats()
+    print(f"{stats['items']} products, {stats['keys']} keys")
+    print(f"rebuild {stats['build_seconds']:.2f} s, memory {stats['memory_bytes'] / 2 ** 20:.1f} MiB")
+
+    for query in QUERIES:
+        number = 2000
+        seconds = min(timeit.repeat(lambda: index.search(query, 10), number=number, repeat=5)) / number
+        print(f'{query:<10} {seconds * 1e6:8.2f} us')
+
+    number = 200
+    seconds = timeit.timeit(lambda: index.add(rnd.randint(1, PRODUCTS), ('گوشی تازه', 'new')), number=number) / number
+    print(f'incremental update {seconds * 1e6:8.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+    Many parallel finalizes of carts that all hold the same hot product.
+    Compares the reservation of Cart.reserve_stock (one round trip per cart) with a select_for_update per line,
+    and with the hot product on flash sale (its stock in sharded redis counters).
+    Runs against a throwaway test database.
+    run from the project root: python -m benchmarks.bench_stock_contention
+"""
+import os
+import statistics
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'karisma_shop.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.exceptions import ValidationError  # noqa: E402
+
+from account.models import Address  # noqa: E402
+from cart.models import Cart  # noqa: E402
+from product.flash_sale import get_flash_sale_stock  # noqa: E402
+from product.models import Product  # noqa: E402
+from shipping.models import Shipping  # noqa: E402
+
+THREADS = 16
+CARTS_PER_THREAD = 25
+LINES_PER_CART = 5
+HOT_STOCK = THREADS * CARTS_PER_THREAD // 2  # half of the checkouts run out of stock
+
+
+def reserve_per_line(cart: Cart):
+    # the naive version: lock and decrement the products one by one, in cart order
+    for item in cart.orderitems.order_by('-id'):
+        product = Product.objects.select_for_update(no_key=True).get(id=item.product_id)
+        if product.stock is None:
+            continue
+        if product.stock < item.quantity:
+            raise ValidationError({'message': 'not enough stock for ' + product.title})
+        Product.objects.filter(id=product.id).update(stock=product.stock - item.quantity)
+
+
+def prepare():
+    Cart.objects.all().delete()
+    Product.objects.all().delete()
+    hot = Product.objects.create(title='hot', slug='hot', base_price=100000, stock=HOT_STOCK)
+    others = [
+        Product.objects.create(title=f'p{i}', slug=f'p{i}', base_price=1000)
+        for i in range(LINES_PER_CART - 1)
+    ]
+    work = []
+    for thread in range(THREADS):
+        user, _ = get_user_model().objects.get_or_create(username=f'buyer{thread}')
+        Cart.objects.get_or_create(user=user, step=Cart.StepChoices.INITIAL)
+        address = Address.objects.create(user=user, province='Tehran', city='tehran', address='somewhere')
+        work.append((user, address))
+    return hot, others, work
+
+
+def run(hot, others, work, flash_sale=False):
+    latencies, results = [], []
+    start = threading.Barrier(THREADS)
+    if flash_sale:
+        get_flash_sale_stock().start(hot)
+
+    def buyer(user, address):
+        start.wait()
+        try:
+            for _ in range(CARTS_PER_THREAD):
+                cart = user.get_initial_cart()
+                cart.add_items({hot.id: 1, **{product.id: 1 for product in others}})
+                started = time.perf_counter()
+                try:
+                    cart.finalize(address, None)
+                    results.append(True)
+                except ValidationError:
+                    results.append(False)
+                    cart.orderitems.all().delete()
+                    continue
+                finally:
+                    latencies.append(time.perf_counter() - started)
+                Cart.objects.create(user=user, step=Cart.StepChoices.INITIAL)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer, args=args) for args in work]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if flash_sale:
+        get_flash_sale_stock().end(hot)
+    hot.refresh_from_db()
+    latencies.sort()
+    return {
+        'finalizes/s': len(latencies) / elapsed,
+        'p50 ms': statistics.median(latencies) * 1000,
+        'p95 ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        'sold': results.count(True),
+        'left': hot.stock,
+    }
+
+
+def main():
+    Shipping.objects.create(type='regular', price=10000)
+    Shipping.objects.create(type='express', price=20000)
+    reserve_stock = Cart.reserve_stock
+    cases = (
+        ('select_for_update per line', reserve_per_line, False),
+        ('one round trip per cart', reserve_stock, False),
+        ('flash sale', reserve_stock, True),
+    )
+    for name, reserve, flash_sale in cases:
+        Cart.reserve_stock = reserve
+        stats = run(*prepare(), flash_sale=flash_sale)
+        assert stats['sold'] == HOT_STOCK and stats['left'] == 0, stats
+        print(f'{name:<28} ' + '  '.join(f'{key} {value:8.1f}' for key, value in stats.items()))
+    Cart.reserve_stock = reserve_stock
+
+
+if __name__ == '__main__':
+    test_database = connection.creation.create_test_db(verbosity=0)
+    try:
+        main()
+    finally:
+        connection.creation.destroy_test_db(test_database, verbosity=0)
@@ -0,0 +1,10 @@
+from utils.pagination import KeysetPagination
+
+
+class OrderKeysetPagination(KeysetPagination):
+    # served by the cart_order_list_idx index of Cart
+    ordering = ('-finalized_at', '-id')
+
+    @classmethod
+    def requested(cls, request) -> bool:
+        return cls.cursor_query_param in request.query_params or request.query_params.get('pagination') == 'cursor'
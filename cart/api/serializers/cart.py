@@ -1,10 +1,10 @@
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
-from rest_framework.fields import SerializerMethodField
 from rest_framework.serializers import ModelSerializer
 
 from cart.models import OrderItem
 from cart.models.cart import Cart
+from cart.models.order_item import MAX_QUANTITY
 from product.models import Product
 
 
@@ -26,23 +26,20 @@ class CartOrderItemSerializer(ModelSerializer):
 
 class CartRetrieveSerializer(ModelSerializer):
     orderitems = CartOrderItemSerializer(many=True)
-    cart_price = SerializerMethodField()
-
-    @staticmethod
-    def get_cart_price(obj: Cart) -> int:
-        return obj.get_cart_price()
+    cart_price = serializers.IntegerField(source='subtotal')
 
     class Meta:
         model = Cart
         fields = (
             'orderitems',
-            'cart_price'
+            'cart_price',
+            'item_count',
         )
 
 
 class AddToCartSerializer(serializers.Serializer):  # user should send id of product
     product = serializers.CharField(allow_null=False, allow_blank=False, required=True)
-    quantity = serializers.IntegerField(default=1)
+    quantity = serializers.IntegerField(default=1, min_value=1, max_value=MAX_QUANTITY)
 
     @staticmethod
     def validate_product(product_id):
@@ -57,3 +54,29 @@ class RemoveFromCartSerializer(serializers.Serializer):  # user should send id o
         cart = self.context.get('cart')
         order_item = get_object_or_404(OrderItem, id=order_item_id, cart_id=cart.id)
         return order_item
+
+
+class CartOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=('add', 'set', 'remove'))
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1, min_value=0, max_value=MAX_QUANTITY)
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs.get('action') == 'add' and attrs.get('quantity') < 1:
+            raise serializers.ValidationError({'quantity': 'quantity of an add should be at least 1'})
+        return attrs
+
+
+class BatchManageCartSerializer(serializers.Serializer):  # user should send a list of operations
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+
+    @staticmethod
+    def validate_operations(operations: list) -> list:
+        product_ids = {operation.get('product') for operation in operations}
+        existing_ids = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        missing_ids = product_ids - existing_ids
+        if missing_ids:
+            raise serializers.ValidationError(
+                {'message': f'products not found: {", ".join(str(id_) for id_ in sorted(missing_ids))}'}
+            )
+        return operations
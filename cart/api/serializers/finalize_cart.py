@@ -4,8 +4,7 @@ from rest_framework.serializers import ModelSerializer
 
 from account.models import Address
 from cart.models import Cart
-from discount.models import Discount
-from discount.services import BaseDiscountValidator
+from discount.services import get_discount_by_code, run_discount_validators
 
 
 class FinalizeCartSerializer(ModelSerializer):  # user should send id of address
@@ -19,11 +18,10 @@ class FinalizeCartSerializer(ModelSerializer):  # user should send id of address
 
     def validate_discount(self, discount_code):
         cart: Cart = self.context.get('cart')
-        discount = Discount.objects.filter(code=discount_code).first()
+        discount = get_discount_by_code(discount_code)
         if not discount:
             raise serializers.ValidationError({'message': 'your code is not correct'})
-        for Validator in BaseDiscountValidator.__subclasses__():
-            Validator.validate(discount, cart)
+        run_discount_validators(discount, cart)
         return discount
 
     class Meta:
@@ -1,3 +1,4 @@
+from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 from rest_framework.serializers import ModelSerializer
 
@@ -26,26 +27,14 @@ class OrderItemSerializer(ModelSerializer):
 
 class OrderListSerializer(ModelSerializer):
     full_name = SerializerMethodField()
-    order_price = SerializerMethodField()
-    order_price_after_discount = SerializerMethodField()
-    order_price_with_shipping = SerializerMethodField()
+    order_price = serializers.IntegerField(read_only=True)
+    order_price_after_discount = serializers.IntegerField(read_only=True)
+    order_price_with_shipping = serializers.IntegerField(read_only=True)
     finalized_at = SerializerMethodField()
 
     @staticmethod
     def get_full_name(obj):
-        return obj.user.get_full_name() if obj.user.get_full_name() else ''
-
-    @staticmethod
-    def get_order_price(obj):
-        return obj.get_order_price() if obj.get_order_price() else 0
-
-    @staticmethod
-    def get_order_price_after_discount(obj):
-        return obj.get_order_price_after_discount()
-
-    @staticmethod
-    def get_order_price_with_shipping(obj):
-        return obj.get_order_price_with_shipping() if obj.get_order_price_with_shipping() else 0
+        return obj.user.get_full_name()
 
     @staticmethod
     def get_finalized_at(obj):
@@ -72,26 +61,14 @@ class OrderListSerializer(ModelSerializer):
 class OrderRetrieveSerializer(ModelSerializer):
     orderitems = OrderItemSerializer(many=True)
     finalized_at = SerializerMethodField()
-    order_price = SerializerMethodField()
-    order_price_after_discount = SerializerMethodField()
-    order_price_with_shipping = SerializerMethodField()
+    order_price = serializers.IntegerField(read_only=True)
+    order_price_after_discount = serializers.IntegerField(read_only=True)
+    order_price_with_shipping = serializers.IntegerField(read_only=True)
 
     @staticmethod
     def get_finalized_at(obj):
         return PersianDateTime(obj.finalized_at)
 
-    @staticmethod
-    def get_order_price(obj):
-        return obj.get_order_price() if obj.get_order_price() else 0
-
-    @staticmethod
-    def get_order_price_after_discount(obj):
-        return obj.get_order_price_after_discount()
-
-    @staticmethod
-    def get_order_price_with_shipping(obj):
-        return obj.get_order_price_with_shipping() if obj.get_order_price_with_shipping() else 0
-
     class Meta:
         model = Cart
         fields = (
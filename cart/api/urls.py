@@ -1,6 +1,7 @@
 from django.urls import path
 
-from cart.api.views.cart import CartRetrieveAPIView, ManageCartAPIView
+from cart.api.views import async_views
+from cart.api.views.cart import CartRetrieveAPIView, ManageCartAPIView, BatchManageCartAPIView
 from cart.api.views.finalize_cart import FinalizeCartAPIView
 from cart.api.views.order import OrderListAPIView, OrderRetrieveAPIView
 
@@ -9,7 +10,11 @@ app_name = 'api'
 urlpatterns = [
     path('cart/', CartRetrieveAPIView.as_view(), name='cart'),
     path('manage-cart/', ManageCartAPIView.as_view(), name='add_or_remove_from_cart'),
+    path('manage-cart/batch/', BatchManageCartAPIView.as_view(), name='batch_manage_cart'),
     path('orders-list/', OrderListAPIView.as_view(), name='order_list'),
     path('order-detail/<pk>/', OrderRetrieveAPIView.as_view(), name='order_detail'),
     path('finalize-cart/', FinalizeCartAPIView.as_view(), name='finalize_cart'),
+    path('async/cart/', async_views.cart_detail, name='async_cart'),
+    path('async/manage-cart/', async_views.add_to_cart, name='async_add_to_cart'),
+    path('async/orders-list/', async_views.order_list, name='async_order_list'),
 ]
@@ -0,0 +1,51 @@
+"""
+    Async variants of the hottest cart and order paths, for the ASGI entry point.
+    Cache and redis are awaited on redis.asyncio. Django 4.0 has no async ORM and psycopg2
+    no async driver, so the database work runs through sync_to_async, in the thread of the request.
+"""
+
+from asgiref.sync import sync_to_async
+from rest_framework.request import Request
+
+from cart.api.serializers.cart import AddToCartSerializer, CartRetrieveSerializer
+from cart.api.views.order import OrderListAPIView
+from cart.cache import acart_payload_response
+from cart.models.cart import Cart
+from cart.stores import get_cart_store
+from utils.async_views import async_api_view, request_data
+from utils.http import json_response
+
+
+def build_cart_payload(user) -> dict:
+    get_cart_store().flush(user)
+    cart = Cart.objects.get_annotated().filter(user_id=user.id).first()
+    return CartRetrieveSerializer(cart).data
+
+
+def build_order_list(request, user) -> dict:
+    # the sync view does the filtering and both kinds of pagination
+    request = Request(request)
+    request.user = user
+    view = OrderListAPIView(request=request, args=(), kwargs={}, format_kwarg=None)
+    return view.list(request).data
+
+
+@async_api_view('GET')
+async def cart_detail(request):
+    build = lambda: sync_to_async(build_cart_payload)(request.user)
+    return await acart_payload_response(request, request.user.id, build)
+
+
+@async_api_view('POST')
+async def add_to_cart(request):
+    serializer = AddToCartSerializer(data=request_data(request))
+    await sync_to_async(serializer.is_valid)(raise_exception=True)
+    product = serializer.validated_data.get('product')
+    quantity = serializer.validated_data.get('quantity')
+    await get_cart_store().aadd_item(request.user, product, quantity)
+    return json_response({'message': 'Product added successfully'})
+
+
+@async_api_view('GET')
+async def order_list(request):
+    return json_response(await sync_to_async(build_order_list)(request, request.user))
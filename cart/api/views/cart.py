@@ -5,19 +5,33 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from cart.api.serializers.cart import AddToCartSerializer, \
-    RemoveFromCartSerializer, CartRetrieveSerializer
+    RemoveFromCartSerializer, CartRetrieveSerializer, BatchManageCartSerializer
+from cart.cache import cart_payload_response
 from cart.models.cart import Cart
+from cart.stores import get_cart_store
 from product.models import Product
+from utils.authentication import ActiveTokenUserAuthentication
 
 
 class CartRetrieveAPIView(RetrieveAPIView):
+    """
+        Served from the cart payload cache, with an ETag of the cart version. The user is taken
+        from the token claims instead of the database (whether it is still active is cached), so an
+        unchanged cart is read without any SQL.
+    """
     serializer_class = CartRetrieveSerializer
     permission_classes = (IsAuthenticated,)
+    authentication_classes = (ActiveTokenUserAuthentication,)
 
     def get_object(self):
-        cart = Cart.objects.get_annotated().filter(user=self.request.user).first()
+        get_cart_store().flush(self.request.user)
+        cart = Cart.objects.get_annotated().filter(user_id=self.request.user.id).first()
         return cart
 
+    def retrieve(self, request, *args, **kwargs):
+        build = lambda: super(CartRetrieveAPIView, self).retrieve(request, *args, **kwargs).data
+        return cart_payload_response(request, request.user.id, build)
+
 
 class ManageCartAPIView(APIView):
     permission_classes = (IsAuthenticated,)
@@ -27,14 +41,14 @@ class ManageCartAPIView(APIView):
         serializer.is_valid(raise_exception=True)
         product: Product = serializer.validated_data.get('product')
         quantity = serializer.validated_data.get('quantity')
-        cart: Cart = self.request.user.get_initial_cart()
-        cart.add_item(product, quantity)
+        get_cart_store().add_item(self.request.user, product, quantity)
         return Response(
             data={'message': 'Product added successfully'},
             status=status.HTTP_200_OK
         )
 
     def delete(self, *args, **kwargs):
+        get_cart_store().flush(self.request.user)
         cart: Cart = self.request.user.get_initial_cart()
         serializer = RemoveFromCartSerializer(
             data=self.request.data,
@@ -42,11 +56,28 @@ class ManageCartAPIView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         order_item = serializer.validated_data.get('order_item')
-        order_item.delete()
+        cart.remove_item(order_item)
         return Response(
             data={'message': 'Removed'},
             status=status.HTTP_204_NO_CONTENT
         )
 
 
+class BatchManageCartAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
 
+    def post(self, *args, **kwargs):
+        serializer = BatchManageCartSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        get_cart_store().flush(self.request.user)
+        cart: Cart = self.request.user.get_initial_cart()
+        cart.apply_operations(serializer.validated_data.get('operations'))
+        cart.refresh_totals()
+        return Response(
+            data={
+                'message': 'Cart updated',
+                'cart_price': cart.subtotal,
+                'item_count': cart.item_count,
+            },
+            status=status.HTTP_200_OK
+        )
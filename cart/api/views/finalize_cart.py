@@ -6,15 +6,31 @@ from rest_framework.views import APIView
 
 from account.models import Address
 from cart.api.serializers.finalize_cart import FinalizeCartSerializer
+from cart.expiry import schedule_order_expiry
 from cart.models import Cart
+from cart.stores import get_cart_store
 from discount.models import Discount
+from discount.services import redeem_discount, release_discount_counters
 
 
 class FinalizeCartAPIView(APIView):
     permission_classes = (IsAuthenticated,)
 
-    @transaction.atomic
     def post(self, *args, **kwargs):
+        # pending add-to-cart writes must be in the database before the cart is checked
+        get_cart_store().flush(self.request.user)
+        # what finalize() did in redis, which is not rolled back with the transaction
+        self.on_rollback = []
+        try:
+            return self.finalize()
+        except BaseException:
+            # rolled back (or the commit failed)
+            for undo in reversed(self.on_rollback):
+                undo()
+            raise
+
+    @transaction.atomic
+    def finalize(self):
         cart: Cart = Cart.objects.get_annotated().filter(user=self.request.user).first()
         cart.allowed_to_finalize(raise_exception=True)
 
@@ -27,7 +43,13 @@ class FinalizeCartAPIView(APIView):
         serializer.is_valid(raise_exception=True)
         address: Address = serializer.validated_data.get('address')
         discount: Discount = serializer.validated_data.get('discount')
+        if discount:
+            # before the stock is taken, a code that reached its limit costs nothing to refuse
+            redeem_discount(discount, cart)
+            self.on_rollback.append(lambda: release_discount_counters(discount, cart.user_id))
+        self.on_rollback.append(cart.give_back_flash_sale_stock)
         cart.finalize(address, discount)
+        transaction.on_commit(lambda: schedule_order_expiry(cart))
 
         Cart.objects.create(user=self.request.user, step='initial')
 
@@ -1,28 +1,64 @@
-from rest_framework.generics import ListAPIView, RetrieveAPIView
+from django.db.models import Prefetch, TextField, Value
+from django.db.models.functions import MD5, Coalesce
+from rest_framework.generics import ListAPIView, RetrieveAPIView, get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 
+from cart.api.pagination import OrderKeysetPagination
 from cart.api.serializers.order import OrderListSerializer, OrderRetrieveSerializer
-from cart.models import Order
+from cart.models import Order, OrderItem
+from utils.authentication import ActiveTokenUserAuthentication
+from utils.http import conditional_response, version_etag
 
 
 class OrderListAPIView(ListAPIView):
     serializer_class = OrderListSerializer
     permission_classes = (IsAuthenticated,)
+    authentication_classes = (ActiveTokenUserAuthentication,)
 
     filterset_fields = (
         'finalized_at',
         'step',
     )
 
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or a cursor) switches from limit/offset to keyset pagination
+        if not hasattr(self, '_paginator'):
+            if OrderKeysetPagination.requested(self.request):
+                self._paginator = OrderKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
-        qs = Order.objects.filter(user=self.request.user).prefetch_related('orderitems')
+        qs = Order.objects.with_totals().filter(user_id=self.request.user.id)
         return qs
 
 
 class OrderRetrieveAPIView(RetrieveAPIView):
+    """
+        The ETag is made of the columns that still change after finalize, read by one
+        small query; the order itself is only loaded and serialized on a mismatch.
+        Totals and lines are frozen at finalize time, and every save() moves finalized_at.
+    """
     serializer_class = OrderRetrieveSerializer
     permission_classes = (IsAuthenticated,)
+    authentication_classes = (ActiveTokenUserAuthentication,)
 
     def get_queryset(self):
-        qs = Order.objects.filter(user=self.request.user).prefetch_related('orderitems')
+        orderitems = Prefetch('orderitems', queryset=OrderItem.objects.select_related('product'))
+        qs = Order.objects.with_totals().filter(user_id=self.request.user.id).prefetch_related(orderitems)
         return qs
+
+    def get_etag(self) -> str:
+        version = get_object_or_404(
+            Order.objects.filter(user_id=self.request.user.id).values_list(
+                'id', 'step', 'finalized_at', 'paid_at', 'delivered_at', MD5(Coalesce('description', Value(''), output_field=TextField())),
+            ),
+            pk=self.kwargs[self.lookup_field],
+        )
+        return version_etag('order', *version)
+
+    def retrieve(self, request, *args, **kwargs):
+        build = lambda: super(OrderRetrieveAPIView, self).retrieve(request, *args, **kwargs).data
+        return conditional_response(request, self.get_etag(), build)
@@ -0,0 +1,74 @@
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from product.services import CATALOG_VERSION_KEY
+from utils.cache import get_version, bump_version, aget_many, aget_version, abump_version, aset
+from utils.http import conditional_response, aconditional_response, version_etag
+
+CART_CACHE_TIMEOUT = settings.CART_CACHE_TIMEOUT
+
+
+def cart_version_key(user_id) -> str:
+    return f'cart:{user_id}:version'
+
+
+def cart_payload_key(user_id) -> str:
+    return f'cart:{user_id}:payload'
+
+
+def bump_cart_version(user_id):
+    bump_version(cart_version_key(user_id))
+    # again after commit, in case a request cached the old lines before the change was visible
+    transaction.on_commit(lambda: bump_version(cart_version_key(user_id)))
+
+
+async def abump_cart_version(user_id):
+    # for changes made outside of any database transaction
+    await abump_version(cart_version_key(user_id))
+
+
+def cart_payload_response(request, user_id, build: Callable):
+    """
+        Responds with the serialized initial cart of the user, building (and caching) it with build() on a miss.
+        The payload is stored with the cart and catalog versions it was built from, and all three are read
+        with one get_many. The ETag is made of the versions alone, so If-None-Match is answered before
+        the payload is even looked at, and a repeat read of an unchanged cart is a single cache round trip.
+    """
+    payload_key, version_key = cart_payload_key(user_id), cart_version_key(user_id)
+    entries = cache.get_many([payload_key, version_key, CATALOG_VERSION_KEY])
+    versions = [entries.get(version_key), entries.get(CATALOG_VERSION_KEY)]
+    if None in versions:
+        versions = [get_version(version_key), get_version(CATALOG_VERSION_KEY)]
+
+    def payload():
+        entry = entries.get(payload_key)
+        if entry is not None and entry['versions'] == versions:
+            return entry['data']
+        # the versions were read before building, so a change made while building leaves the entry stale
+        data = build()
+        cache.set(payload_key, {'versions': versions, 'data': data}, CART_CACHE_TIMEOUT)
+        return data
+
+    return conditional_response(request, version_etag('cart', user_id, *versions), payload)
+
+
+async def acart_payload_response(request, user_id, build: Callable):
+    # cart_payload_response() for async views, build() is awaited
+    payload_key, version_key = cart_payload_key(user_id), cart_version_key(user_id)
+    entries = await aget_many([payload_key, version_key, CATALOG_VERSION_KEY])
+    versions = [entries.get(version_key), entries.get(CATALOG_VERSION_KEY)]
+    if None in versions:
+        versions = [await aget_version(version_key), await aget_version(CATALOG_VERSION_KEY)]
+
+    async def payload():
+        entry = entries.get(payload_key)
+        if entry is not None and entry['versions'] == versions:
+            return entry['data']
+        data = await build()
+        await aset(payload_key, {'versions': versions, 'data': data}, CART_CACHE_TIMEOUT)
+        return data
+
+    return await aconditional_response(request, version_etag('cart', user_id, *versions), payload)
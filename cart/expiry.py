@@ -0,0 +1,75 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from cart.models import Order
+from discount.services import release_discount_redemptions
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_KEY = 'orders:expiry'
+
+
+def order_expires_at(finalized_at: datetime) -> datetime:
+    return finalized_at + timedelta(seconds=settings.CART_ORDER_EXPIRE_TIME)
+
+
+def schedule_order_expiry(order: Order):
+    """
+        Puts the order in a redis sorted set scored by its deadline.
+        Called after the finalize transaction commits; if redis is unavailable
+        the order is still canceled by the cancel_pending_orders sweep.
+    """
+    try:
+        get_redis().zadd(EXPIRY_KEY, {order.id: order_expires_at(order.finalized_at).timestamp()})
+    except Exception:
+        logger.exception('could not schedule expiry of order %s', order.id)
+
+
+def cancel_orders(orders: QuerySet, limit: int) -> List[int]:
+    """
+        Cancels up to `limit` pending orders of the queryset and gives back their stock and discount codes.
+        Rows locked by a running checkout or payment are skipped instead of waited for.
+    """
+    with transaction.atomic():
+        ids = list(
+            orders.filter(step=Order.StepChoices.PENDING)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            Order.objects.filter(id__in=ids).update(step=Order.StepChoices.CANCELED)
+            Order.objects.release_stock(ids)
+            release_discount_redemptions(ids)
+    return ids
+
+
+def expire_due_orders(now: datetime = None) -> int:
+    redis = get_redis()
+    now = now or timezone.now()
+    chunk_size = settings.ORDER_EXPIRY_CHUNK_SIZE
+    canceled_count = 0
+    while True:
+        due = [int(order_id) for order_id in redis.zrangebyscore(EXPIRY_KEY, '-inf', now.timestamp(), 0, chunk_size)]
+        if not due:
+            return canceled_count
+        canceled = cancel_orders(Order.objects.filter(id__in=due), len(due))
+        canceled_count += len(canceled)
+        remaining = set(due) - set(canceled)
+        # still pending means another transaction holds the row, try again a bit later
+        locked = set(Order.objects.filter(id__in=remaining, step=Order.StepChoices.PENDING).values_list('id', flat=True))
+        pipe = redis.pipeline()
+        if locked:
+            retry_at = (now + timedelta(seconds=settings.ORDER_EXPIRY_RETRY_DELAY)).timestamp()
+            pipe.zadd(EXPIRY_KEY, {order_id: retry_at for order_id in locked}, xx=True)
+        done = set(due) - locked
+        if done:
+            pipe.zrem(EXPIRY_KEY, *done)
+        pipe.execute()
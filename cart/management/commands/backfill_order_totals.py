@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import F, ExpressionWrapper
+
+from cart.models import Order
+from cart.models.cart import order_items_total, total_after_discount
+
+
+class Command(BaseCommand):
+    help = 'Fills items_total, total_after_discount and grand_total of orders finalized before they existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = models.BigIntegerField()
+        updated = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    Order.objects.filter(items_total__isnull=True).order_by('id').values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                after_discount = total_after_discount(order_items_total(), F('discount_price'))
+                updated += Order.objects.filter(id__in=ids).update(
+                    items_total=order_items_total(),
+                    total_after_discount=after_discount,
+                    grand_total=ExpressionWrapper(after_discount + F('shipping_price'), output_field=total),
+                )
+            self.stdout.write(f'{updated} orders backfilled')
+        self.stdout.write(self.style.SUCCESS(f'done, {updated} orders backfilled'))
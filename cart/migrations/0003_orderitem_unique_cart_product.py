@@ -0,0 +1,34 @@
+# Generated by Django 4.0.6 on 2026-10-18 10:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_order_items(apps, schema_editor):
+    OrderItem = apps.get_model('cart', 'OrderItem')
+    duplicates = OrderItem.objects.values('cart_id', 'product_id').annotate(
+        lines=Count('id'),
+        first_id=Min('id'),
+        total_quantity=Sum('quantity'),
+    ).filter(lines__gt=1)
+    for duplicate in duplicates:
+        OrderItem.objects.filter(id=duplicate['first_id']).update(quantity=duplicate['total_quantity'])
+        OrderItem.objects.filter(
+            cart_id=duplicate['cart_id'],
+            product_id=duplicate['product_id'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_alter_cart_options_rename_created_cart_finalized_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_order_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 4.0.6 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+# The totals of an initial cart are adjusted by the delta of every order item insert/update/delete
+# and of every product price change, so readers never have to aggregate the lines.
+CART_TOTALS_SQL = """
+CREATE OR REPLACE FUNCTION cart_orderitem_totals() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.cart_id = OLD.cart_id AND NEW.product_id = OLD.product_id THEN
+        UPDATE cart_cart c SET
+            subtotal = c.subtotal + (COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0)) * (p.base_price + p.profit_price),
+            item_count = c.item_count + COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0)
+        FROM product_product p
+        WHERE c.id = NEW.cart_id AND p.id = NEW.product_id AND c.step = 'initial';
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE cart_cart c SET
+            subtotal = c.subtotal - COALESCE(OLD.quantity, 0) * (p.base_price + p.profit_price),
+            item_count = c.item_count - COALESCE(OLD.quantity, 0),
+            has_fragile_item = CASE WHEN p.is_fragile THEN EXISTS (
+                SELECT 1 FROM cart_orderitem oi
+                JOIN product_product fp ON fp.id = oi.product_id
+                WHERE oi.cart_id = c.id AND fp.is_fragile
+            ) ELSE c.has_fragile_item END
+        FROM product_product p
+        WHERE c.id = OLD.cart_id AND p.id = OLD.product_id AND c.step = 'initial';
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE cart_cart c SET
+            subtotal = c.subtotal + COALESCE(NEW.quantity, 0) * (p.base_price + p.profit_price),
+            item_count = c.item_count + COALESCE(NEW.quantity, 0),
+            has_fragile_item = c.has_fragile_item OR p.is_fragile
+        FROM product_product p
+        WHERE c.id = NEW.cart_id AND p.id = NEW.product_id AND c.step = 'initial';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER cart_orderitem_totals
+AFTER INSERT OR UPDATE OF cart_id, product_id, quantity OR DELETE ON cart_orderitem
+FOR EACH ROW EXECUTE FUNCTION cart_orderitem_totals();
+
+CREATE OR REPLACE FUNCTION cart_product_totals() RETURNS trigger AS $$
+BEGIN
+    UPDATE cart_cart c SET
+        subtotal = c.subtotal + COALESCE(oi.quantity, 0) * (
+            (NEW.base_price + NEW.profit_price) - (OLD.base_price + OLD.profit_price)
+        ),
+        has_fragile_item = CASE WHEN NEW.is_fragile THEN true ELSE EXISTS (
+            SELECT 1 FROM cart_orderitem foi
+            JOIN product_product fp ON fp.id = foi.product_id
+            WHERE foi.cart_id = c.id AND fp.is_fragile
+        ) END
+    FROM cart_orderitem oi
+    WHERE oi.product_id = NEW.id AND c.id = oi.cart_id AND c.step = 'initial';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER cart_product_totals
+AFTER UPDATE OF base_price, profit_price, is_fragile ON product_product
+FOR EACH ROW
+WHEN (
+    NEW.base_price + NEW.profit_price IS DISTINCT FROM OLD.base_price + OLD.profit_price
+    OR NEW.is_fragile IS DISTINCT FROM OLD.is_fragile
+)
+EXECUTE FUNCTION cart_product_totals();
+
+UPDATE cart_cart c SET
+    subtotal = totals.subtotal,
+    item_count = totals.item_count,
+    has_fragile_item = totals.has_fragile_item
+FROM (
+    SELECT
+        oi.cart_id,
+        SUM(COALESCE(oi.quantity, 0) * (p.base_price + p.profit_price)) AS subtotal,
+        SUM(COALESCE(oi.quantity, 0)) AS item_count,
+        bool_or(p.is_fragile) AS has_fragile_item
+    FROM cart_orderitem oi
+    JOIN product_product p ON p.id = oi.product_id
+    GROUP BY oi.cart_id
+) totals
+WHERE c.id = totals.cart_id AND c.step = 'initial';
+"""
+
+DROP_CART_TOTALS_SQL = """
+DROP TRIGGER IF EXISTS cart_product_totals ON product_product;
+DROP FUNCTION IF EXISTS cart_product_totals();
+DROP TRIGGER IF EXISTS cart_orderitem_totals ON cart_orderitem;
+DROP FUNCTION IF EXISTS cart_orderitem_totals();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_orderitem_unique_cart_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='has_fragile_item',
+            field=models.BooleanField(default=False, help_text='این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود.'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, help_text='این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود.'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.PositiveBigIntegerField(default=0, help_text='این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود.'),
+        ),
+        migrations.RunSQL(CART_TOTALS_SQL, DROP_CART_TOTALS_SQL),
+    ]
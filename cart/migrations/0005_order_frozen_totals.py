@@ -0,0 +1,32 @@
+# Generated by Django 4.0.6 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_cart_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='grand_total',
+            field=models.PositiveBigIntegerField(blank=True, help_text='این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود.', null=True),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='items_total',
+            field=models.PositiveBigIntegerField(blank=True, help_text='این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود.', null=True),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_after_discount',
+            field=models.PositiveBigIntegerField(blank=True, help_text='این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['grand_total'], name='cart_grand_total_idx'),
+        ),
+    ]
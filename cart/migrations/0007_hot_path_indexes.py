@@ -0,0 +1,51 @@
+# Generated by Django 4.0.6 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+# users with more than one initial cart keep the newest one, which gets the lines of the others
+MERGE_INITIAL_CARTS_SQL = """
+SET CONSTRAINTS ALL IMMEDIATE;
+
+CREATE TEMPORARY TABLE duplicate_initial_carts ON COMMIT DROP AS
+SELECT id, keep_id FROM (
+    SELECT id, FIRST_VALUE(id) OVER (PARTITION BY user_id ORDER BY id DESC) AS keep_id
+    FROM cart_cart
+    WHERE step = 'initial'
+) ranked
+WHERE id <> keep_id;
+
+INSERT INTO cart_orderitem (cart_id, product_id, quantity, created)
+SELECT d.keep_id, oi.product_id, SUM(oi.quantity), now()
+FROM cart_orderitem oi
+JOIN duplicate_initial_carts d ON d.id = oi.cart_id
+GROUP BY d.keep_id, oi.product_id
+ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = cart_orderitem.quantity + EXCLUDED.quantity;
+
+DELETE FROM cart_orderitem WHERE cart_id IN (SELECT id FROM duplicate_initial_carts);
+DELETE FROM cart_cart WHERE id IN (SELECT id FROM duplicate_initial_carts);
+
+SET CONSTRAINTS ALL DEFERRED;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_order_frozen_totals'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_INITIAL_CARTS_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('step', 'pending')), fields=['finalized_at'], name='cart_pending_finalized_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('step', 'initial'), _negated=True), fields=['user', '-finalized_at', '-id'], include=('step', 'discount_price', 'shipping_price', 'items_total', 'total_after_discount', 'grand_total', 'paid_at'), name='cart_order_list_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('step', 'initial')), fields=('user',), name='unique_initial_cart'),
+        ),
+    ]
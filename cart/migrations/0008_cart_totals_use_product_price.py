@@ -0,0 +1,87 @@
+# Generated by Django 4.0.6 on 2026-10-18 11:01
+
+from django.db import migrations
+
+
+def cart_totals_sql(price: str, product_columns: str) -> str:
+    """
+        The functions of 0004_cart_totals with the price of a product given as an SQL template
+        ({p} is the product row), so the migration can be reversed to the summed components.
+    """
+    return f"""
+CREATE OR REPLACE FUNCTION cart_orderitem_totals() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.cart_id = OLD.cart_id AND NEW.product_id = OLD.product_id THEN
+        UPDATE cart_cart c SET
+            subtotal = c.subtotal + (COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0)) * {price.format(p='p')},
+            item_count = c.item_count + COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0)
+        FROM product_product p
+        WHERE c.id = NEW.cart_id AND p.id = NEW.product_id AND c.step = 'initial';
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE cart_cart c SET
+            subtotal = c.subtotal - COALESCE(OLD.quantity, 0) * {price.format(p='p')},
+            item_count = c.item_count - COALESCE(OLD.quantity, 0),
+            has_fragile_item = CASE WHEN p.is_fragile THEN EXISTS (
+                SELECT 1 FROM cart_orderitem oi
+                JOIN product_product fp ON fp.id = oi.product_id
+                WHERE oi.cart_id = c.id AND fp.is_fragile
+            ) ELSE c.has_fragile_item END
+        FROM product_product p
+        WHERE c.id = OLD.cart_id AND p.id = OLD.product_id AND c.step = 'initial';
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE cart_cart c SET
+            subtotal = c.subtotal + COALESCE(NEW.quantity, 0) * {price.format(p='p')},
+            item_count = c.item_count + COALESCE(NEW.quantity, 0),
+            has_fragile_item = c.has_fragile_item OR p.is_fragile
+        FROM product_product p
+        WHERE c.id = NEW.cart_id AND p.id = NEW.product_id AND c.step = 'initial';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION cart_product_totals() RETURNS trigger AS $$
+BEGIN
+    UPDATE cart_cart c SET
+        subtotal = c.subtotal + COALESCE(oi.quantity, 0) * ({price.format(p='NEW')} - {price.format(p='OLD')}),
+        has_fragile_item = CASE WHEN NEW.is_fragile THEN true ELSE EXISTS (
+            SELECT 1 FROM cart_orderitem foi
+            JOIN product_product fp ON fp.id = foi.product_id
+            WHERE foi.cart_id = c.id AND fp.is_fragile
+        ) END
+    FROM cart_orderitem oi
+    WHERE oi.product_id = NEW.id AND c.id = oi.cart_id AND c.step = 'initial';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER cart_product_totals ON product_product;
+CREATE TRIGGER cart_product_totals
+AFTER UPDATE OF {product_columns}, is_fragile ON product_product
+FOR EACH ROW
+WHEN (
+    {price.format(p='NEW')} IS DISTINCT FROM {price.format(p='OLD')}
+    OR NEW.is_fragile IS DISTINCT FROM OLD.is_fragile
+)
+EXECUTE FUNCTION cart_product_totals();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0007_hot_path_indexes'),
+        ('product', '0003_product_price'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            # price is set by a BEFORE trigger, which does not put it in the column list of the UPDATE,
+            # so the trigger still has to fire on the components
+            cart_totals_sql('{p}.price', 'base_price, profit_price, price'),
+            cart_totals_sql('({p}.base_price + {p}.profit_price)', 'base_price, profit_price'),
+        ),
+    ]
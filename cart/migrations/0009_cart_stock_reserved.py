@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0008_cart_totals_use_product_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='stock_reserved',
+            field=models.BooleanField(default=False, help_text='این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود.'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.6 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0009_cart_stock_reserved'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='has_fragile_item',
+            field=models.BooleanField(default=False, editable=False, help_text='این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود.'),
+        ),
+        migrations.AlterField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود.'),
+        ),
+        migrations.AlterField(
+            model_name='cart',
+            name='subtotal',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود.'),
+        ),
+    ]
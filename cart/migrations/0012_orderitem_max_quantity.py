@@ -0,0 +1,19 @@
+# Generated by Django 4.0.6 on 2026-10-18 12:37
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0010_cart_totals_not_editable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderitem',
+            name='quantity',
+            field=models.PositiveSmallIntegerField(default=1, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(32767)]),
+        ),
+    ]
@@ -1,18 +1,25 @@
-from typing import Union
+from typing import List, Union
 
 from django.conf import settings
-from django.db import models
-from django.db.models import F, Sum, Prefetch, QuerySet
+from django.db import models, transaction, connection
+from django.db.models import F, Sum, Prefetch, QuerySet, OuterRef, Subquery, ExpressionWrapper, Q, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from cart.cache import bump_cart_version
 from cart.utils import is_between
 from discount.models import Discount
+from product.flash_sale import get_flash_sale_stock
 from product.models import Product
 from shipping.models import Shipping
+from shipping.services import shipping_registry
 
 User = settings.AUTH_USER_MODEL
 
+# kept by the triggers of migration 0004, an instance may hold stale values of them
+TRIGGER_FIELDS = ('subtotal', 'item_count', 'has_fragile_item')
+
 
 class CartManager(models.Manager):
     def get_queryset(self):
@@ -21,7 +28,7 @@ class CartManager(models.Manager):
     def get_annotated(self) -> QuerySet['Cart']:
         from cart.models import OrderItem
         orderitems = OrderItem.objects.annotate(
-            product_price=F('product__base_price') + F('product__profit_price'),
+            product_price=F('product__price'),
         ).annotate(
             order_line_price=F('product_price') * F('quantity')
         ).select_related('product')
@@ -35,6 +42,125 @@ class OrderManager(models.Manager):
 
         return super().get_queryset().exclude(step=Cart.StepChoices.INITIAL)
 
+    def with_totals(self) -> QuerySet['Order']:
+        """
+            order_price, order_price_after_discount and order_price_with_shipping in the same query.
+            They are read from the columns frozen at finalize time; the lines are only summed
+            for orders that have not been frozen (or backfilled) yet.
+        """
+        total = models.BigIntegerField()
+        qs = self.get_queryset().select_related('user').annotate(
+            order_price=Coalesce('items_total', order_items_total(), output_field=total),
+        ).annotate(
+            order_price_after_discount=Coalesce(
+                'total_after_discount',
+                total_after_discount(F('order_price'), F('discount_price')),
+                output_field=total,
+            ),
+        ).annotate(
+            order_price_with_shipping=Coalesce(
+                'grand_total',
+                ExpressionWrapper(F('order_price_after_discount') + F('shipping_price'), output_field=total),
+                output_field=total,
+            ),
+        )
+        return qs
+
+    def release_stock(self, order_ids: List[int]):
+        # gives back the stock reserved by these orders, all of them in one round trip
+        if not order_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(RELEASE_STOCK_SQL, {'order_ids': list(order_ids)})
+            flash_sale_quantities = dict(cursor.fetchall())
+        if flash_sale_quantities:
+            transaction.on_commit(lambda: get_flash_sale_stock().give_back(flash_sale_quantities))
+
+
+# KEY SHARE keeps FlashSaleStock.start() and end() (FOR UPDATE) off the products of the cart until it commits,
+# so whether a product is on flash sale cannot change while its stock is taken. Other carts are not blocked.
+LOCK_CART_PRODUCTS_SQL = """
+SELECT p.id, p.flash_sale, COALESCE(oi.quantity, 0)
+FROM product_product p
+JOIN cart_orderitem oi ON oi.product_id = p.id
+WHERE oi.cart_id = %(cart_id)s
+ORDER BY p.id
+FOR KEY SHARE OF p
+"""
+
+# Two statements sent in one round trip: the first locks the products of the lines in id order,
+# the second runs with a new snapshot on rows nobody else can change anymore. Locking and updating
+# in the same statement makes the UPDATE re-lock rows changed by other carts, which deadlocks.
+RESERVE_STOCK_SQL = """
+SELECT p.id
+FROM product_product p
+JOIN cart_orderitem oi ON oi.product_id = p.id
+WHERE oi.cart_id = %(cart_id)s AND p.stock IS NOT NULL AND NOT p.flash_sale
+ORDER BY p.id
+FOR NO KEY UPDATE OF p;
+
+WITH lines AS (
+    SELECT p.id, COALESCE(oi.quantity, 0) AS quantity, p.stock
+    FROM product_product p
+    JOIN cart_orderitem oi ON oi.product_id = p.id
+    WHERE oi.cart_id = %(cart_id)s AND p.stock IS NOT NULL AND NOT p.flash_sale
+), short AS (
+    SELECT id FROM lines WHERE stock < quantity
+), reserved AS (
+    UPDATE product_product p SET stock = p.stock - lines.quantity
+    FROM lines
+    WHERE p.id = lines.id AND NOT EXISTS (SELECT 1 FROM short)
+)
+SELECT id FROM short
+"""
+
+# same two steps; the orders are locked by the caller, so stock_reserved cannot change in between
+RELEASE_STOCK_SQL = """
+SELECT p.id
+FROM product_product p
+WHERE p.stock IS NOT NULL AND NOT p.flash_sale AND p.id IN (
+    SELECT oi.product_id
+    FROM cart_orderitem oi
+    JOIN cart_cart c ON c.id = oi.cart_id
+    WHERE c.id = ANY(%(order_ids)s) AND c.stock_reserved
+)
+ORDER BY p.id
+FOR NO KEY UPDATE OF p;
+
+WITH released AS (
+    UPDATE cart_cart SET stock_reserved = false
+    WHERE id = ANY(%(order_ids)s) AND stock_reserved
+    RETURNING id
+), quantities AS (
+    SELECT oi.product_id, SUM(COALESCE(oi.quantity, 0)) AS quantity
+    FROM cart_orderitem oi
+    JOIN released r ON r.id = oi.cart_id
+    GROUP BY oi.product_id
+), restocked AS (
+    UPDATE product_product p SET stock = p.stock + quantities.quantity
+    FROM quantities
+    WHERE p.id = quantities.product_id AND p.stock IS NOT NULL AND NOT p.flash_sale
+)
+SELECT quantities.product_id, quantities.quantity
+FROM quantities
+JOIN product_product p ON p.id = quantities.product_id
+WHERE p.flash_sale
+"""
+
+
+def order_items_total() -> Coalesce:
+    # SUM(price * quantity) of the lines of the outer order
+    from cart.models import OrderItem
+    items_total = OrderItem.objects.filter(cart_id=OuterRef('id')).values('cart_id').annotate(
+        total=Sum(F('price') * F('quantity'), output_field=models.BigIntegerField())
+    ).values('total')
+    return Coalesce(Subquery(items_total), 0, output_field=models.BigIntegerField())
+
+
+def total_after_discount(items_total, discount_price) -> Greatest:
+    # a discount never takes an order below zero; with_totals, freeze_totals and the backfill all use it
+    return Greatest(items_total - discount_price, 0, output_field=models.BigIntegerField())
+
 
 class Cart(models.Model):
     user = models.ForeignKey(
@@ -97,23 +223,92 @@ class Cart(models.Model):
         null=True,
         blank=True
     )
+    # kept up to date by database triggers while the cart is initial (see migration 0004)
+    subtotal = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود."
+    )
+    item_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود."
+    )
+    has_fragile_item = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="این فیلد به صورت اتوماتیک با تغییر اقلام سبد خرید به روز میشود."
+    )
+    items_total = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود."
+    )
+    total_after_discount = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود."
+    )
+    grand_total = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود."
+    )
+    stock_reserved = models.BooleanField(
+        default=False,
+        help_text="این فیلد به صورت اتوماتیک بعد از نهایی شدن سفارش پر میشود."
+    )
     objects = CartManager()
 
     class Meta:
         ordering = ('-finalized_at',)
+        indexes = (
+            models.Index(fields=('grand_total',), name='cart_grand_total_idx'),
+            # cancel_pending_orders
+            models.Index(
+                fields=('finalized_at',),
+                condition=Q(step='pending'),
+                name='cart_pending_finalized_idx',
+            ),
+            # order list of a user, with the columns it shows
+            models.Index(
+                fields=('user', '-finalized_at', '-id'),
+                condition=~Q(step='initial'),
+                include=('step', 'discount_price', 'shipping_price', 'items_total', 'total_after_discount',
+                         'grand_total', 'paid_at'),
+                name='cart_order_list_idx',
+            ),
+        )
+        constraints = (
+            # get_initial_cart
+            models.UniqueConstraint(fields=('user',), condition=Q(step='initial'), name='unique_initial_cart'),
+        )
         verbose_name = 'Cart'
         verbose_name_plural = 'Carts'
 
     def __str__(self):
         return f'{self.user} - {self.step}'
 
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            # a full save would write back the totals read before the lines changed, refresh_totals() reads them
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TRIGGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def refresh_totals(self):
+        self.refresh_from_db(fields=TRIGGER_FIELDS)
+
     def get_cart_price(self):
+        # sums the lines; hot paths read the trigger maintained subtotal instead
         # get annotated field
         try:
             total_price = sum([orderitem.order_line_price for orderitem in self.orderitems.all()])
         except AttributeError:
             aggregated_price: dict = self.orderitems.annotate(
-                total_price=(F('product__base_price') + F('product__profit_price')) * F('quantity'),
+                total_price=F('product__price') * F('quantity'),
             ).aggregate(
                 total=Sum('total_price')
             )
@@ -121,20 +316,59 @@ class Cart(models.Model):
         return total_price
 
     def add_item(self, product: Product, quantity: int):
-        if self.orderitems.filter(product_id=product.id).exists():
-            self.orderitems.filter(product_id=product.id).update(quantity=F('quantity') + quantity)
-        else:
-            self.orderitems.create(
-                product=product,
-                quantity=quantity
-            )
+        self.add_items({product.id: quantity})
+
+    def add_items(self, quantities: dict):
+        # {product_id: quantity}
+        from cart.models import OrderItem
+        OrderItem.objects.add_quantities(self.id, quantities)
+        bump_cart_version(self.user_id)
+
+    def remove_item(self, order_item):
+        order_item.delete()
+        bump_cart_version(self.user_id)
+
+    def apply_operations(self, operations: list):
+        """
+            operations are dicts of action ('add', 'set' or 'remove'), product (id) and quantity.
+            They are folded in order, so the whole batch costs at most one delete
+            and two upserts no matter how many lines it touches.
+        """
+        from cart.models import OrderItem
+        added, replaced, removed = {}, {}, set()
+        for operation in operations:
+            product_id = operation['product']
+            quantity = operation.get('quantity', 0)
+            if operation['action'] == 'add':
+                if product_id in replaced:
+                    replaced[product_id] += quantity
+                elif product_id in removed:
+                    removed.discard(product_id)
+                    replaced[product_id] = quantity
+                else:
+                    added[product_id] = added.get(product_id, 0) + quantity
+            elif operation['action'] == 'set' and quantity > 0:
+                added.pop(product_id, None)
+                removed.discard(product_id)
+                replaced[product_id] = quantity
+            else:  # remove, or set to zero
+                added.pop(product_id, None)
+                replaced.pop(product_id, None)
+                removed.add(product_id)
+
+        with transaction.atomic():
+            if removed:
+                OrderItem.objects.filter(cart_id=self.id, product_id__in=removed).delete()
+            OrderItem.objects.set_quantities(self.id, replaced)
+            OrderItem.objects.add_quantities(self.id, added)
+        bump_cart_version(self.user_id)
 
     def allowed_to_finalize(self, raise_exception=True) -> bool:
         message = None
-        if not self.orderitems.exists():
+        if not self.item_count:
             message = 'your basket is empty'
         else:
-            if self.get_cart_price() < settings.MINIMUM_CART_PRICE_TO_FINALIZE:
+            if self.subtotal < settings.MINIMUM_CART_PRICE_TO_FINALIZE:
                 message = 'you can only finalize your cart if your total price is greater than ' + str(
                     settings.MINIMUM_CART_PRICE_TO_FINALIZE)
         start_time = settings.FINALIZE_CART_PERIOD.get('start')
@@ -148,10 +382,11 @@ class Cart(models.Model):
             return False
         return True
 
+    @transaction.atomic
     def finalize(self, address, discount: Union[Discount, None]):
-        for item in self.orderitems.all():
-            item.price = item.product.get_price()
-            item.save()
+        # snapshot the price of every line in one UPDATE, whatever the size of the cart
+        product_price = Product.objects.filter(id=OuterRef('product_id')).values('price')
+        self.orderitems.update(price=Subquery(product_price))
 
         self.step = Cart.StepChoices.PENDING
         self.receiver_address = address.get_full_address()
@@ -163,14 +398,65 @@ class Cart(models.Model):
         self.shipping = shipping
         self.shipping_price = shipping.price
 
+        self.freeze_totals()
+
         self.finalized_at = timezone.now()
+        self.stock_reserved = True
         self.save()
+        bump_cart_version(self.user_id)
+        # last, so the product rows stay locked for as short as possible before the commit
+        self.reserve_stock()
+
+    def reserve_stock(self):
+        """
+            Takes the quantity of every line from the stock of its product in one round trip:
+            the products are locked in id order (so two carts can never deadlock), and
+            only if none of them is short are they all decremented by one conditional UPDATE.
+            NO KEY UPDATE does not block the foreign key checks of carts adding these products.
+            Products without stock (NULL) are not tracked.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_CART_PRODUCTS_SQL, {'cart_id': self.id})
+            flash_sale_lines = {
+                product_id: quantity for product_id, flash_sale, quantity in cursor.fetchall() if flash_sale
+            }
+            cursor.execute(RESERVE_STOCK_SQL, {'cart_id': self.id})
+            short = [product_id for product_id, in cursor.fetchall()]
+        if not short and flash_sale_lines:
+            # the stock of flash sale products is taken from redis, after the rows so a short row costs nothing there
+            short = get_flash_sale_stock().take(flash_sale_lines)
+            if not short:
+                # given back by the caller if the transaction does not commit, redis is not rolled back with it
+                self.flash_sale_taken = flash_sale_lines
+        if short:
+            titles = Product.objects.filter(id__in=short).order_by('id').values_list('title', flat=True)
+            raise ValidationError({'message': 'not enough stock for ' + ', '.join(titles)})
+
+    def give_back_flash_sale_stock(self):
+        if getattr(self, 'flash_sale_taken', None):
+            get_flash_sale_stock().give_back(self.flash_sale_taken)
+            self.flash_sale_taken = None
+
+    def freeze_totals(self):
+        # once finalized the totals of an order never change, so they are stored instead of summed on every read
+        totals = self.sum_totals()
+        self.items_total = totals['items_total']
+        self.total_after_discount = totals['total_after_discount']
+        self.grand_total = self.total_after_discount + self.shipping_price
+
+    def sum_totals(self) -> dict:
+        # items_total and total_after_discount summed from the lines, in one query
+        items_total = Coalesce(Sum(F('price') * F('quantity')), 0, output_field=models.BigIntegerField())
+        return self.orderitems.aggregate(
+            items_total=items_total,
+            total_after_discount=total_after_discount(items_total, Value(self.discount_price)),
+        )
 
     def get_shipping(self) -> Shipping:
-        if self.orderitems.filter(product__is_fragile=True).exists():
-            shipping = Shipping.objects.filter(type='express').first()
+        if self.has_fragile_item:
+            shipping = shipping_registry.get(Shipping.ShipmentChoices.EXPRESS)
         else:
-            shipping = Shipping.objects.filter(type='regular').first()
+            shipping = shipping_registry.get(Shipping.ShipmentChoices.REGULAR)
         return shipping
 
 
@@ -180,15 +466,21 @@ class Order(Cart):
     objects = OrderManager()
 
     def get_order_price(self):
+        if self.items_total is not None:
+            return self.items_total
         total_price = self.orderitems.annotate(order_price=F('price') * F('quantity')).aggregate(
             total=Sum('order_price'))
         return total_price['total'] if total_price['total'] else 0
 
     def get_order_price_after_discount(self):
-        return self.get_order_price() - self.discount_price
+        if self.total_after_discount is not None:
+            return self.total_after_discount
+        return self.sum_totals()['total_after_discount']
 
     def get_shipping_price(self):
         return self.shipping.price
 
     def get_order_price_with_shipping(self):
+        if self.grand_total is not None:
+            return self.grand_total
         return self.get_order_price_after_discount() + self.shipping_price
@@ -1,9 +1,51 @@
 from django.conf import settings
-from django.core.validators import MinValueValidator
-from django.db import models
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import models, connection
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
+MAX_QUANTITY = 32767  # of a line, the largest PositiveSmallIntegerField
+
+
+class OrderItemManager(models.Manager):
+    def add_quantities(self, cart_id: int, quantities: dict) -> None:
+        """
+            Adds {product_id: quantity} to the lines of a cart in a single
+            INSERT ... ON CONFLICT statement. A product that is already in the cart
+            gets its quantity incremented instead of a second line, up to MAX_QUANTITY.
+        """
+        # repeated adds (or the lines of the redis cart store) can sum past the smallint column, summed as integer;
+        # a NULL quantity counts as 0 like in the cart totals triggers, LEAST() would skip a NULL sum
+        self._upsert(
+            cart_id, quantities,
+            f'quantity = LEAST(COALESCE({{table}}.quantity, 0)::integer + EXCLUDED.quantity, {MAX_QUANTITY})',
+        )
+
+    def set_quantities(self, cart_id: int, quantities: dict) -> None:
+        # same as add_quantities, but existing lines get the new quantity instead of the sum
+        self._upsert(cart_id, quantities, 'quantity = EXCLUDED.quantity')
+
+    def _upsert(self, cart_id: int, quantities: dict, update: str) -> None:
+        if not quantities:
+            return
+        table = self.model._meta.db_table
+        now = timezone.now()
+        values = []
+        params = []
+        for product_id, quantity in quantities.items():
+            values.append('(%s, %s, %s, %s)')
+            # a batch folds the adds of a product into one quantity, which can pass the column too
+            params.extend([cart_id, product_id, min(quantity, MAX_QUANTITY), now])
+        sql = (
+            f'INSERT INTO {table} (cart_id, product_id, quantity, created) '
+            f'VALUES {", ".join(values)} '
+            f'ON CONFLICT (cart_id, product_id) DO UPDATE '
+            f'SET {update.format(table=table)}, created = EXCLUDED.created'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
 
 class OrderItem(models.Model):
     """
@@ -30,12 +72,16 @@ class OrderItem(models.Model):
     )
     quantity = models.PositiveSmallIntegerField(
         default=1,
-        validators=[MinValueValidator(1)],
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_QUANTITY)],
         null=True
     )
     created = models.DateTimeField(auto_now=True)
+    objects = OrderItemManager()
 
     class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        )
         verbose_name = 'Order Item'
         verbose_name_plural = 'Order Items'
 
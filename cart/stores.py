@@ -0,0 +1,126 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.module_loading import import_string
+
+from cart.cache import bump_cart_version, abump_cart_version
+from cart.models import Cart
+from product.models import Product
+from utils.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class BaseCartStore:
+    """
+        Where add-to-cart writes go before they reach the INITIAL cart in the database.
+        Readers that need the real cart (retrieve, remove, finalize) call flush() first.
+    """
+
+    def add_item(self, user, product: Product, quantity: int):
+        raise NotImplementedError
+
+    async def aadd_item(self, user, product: Product, quantity: int):
+        await sync_to_async(self.add_item)(user, product, quantity)
+
+    def flush(self, user):
+        raise NotImplementedError
+
+    def flush_pending(self) -> int:
+        raise NotImplementedError
+
+
+class DatabaseCartStore(BaseCartStore):
+    def add_item(self, user, product: Product, quantity: int):
+        # by id, user may be the TokenUser of an async view
+        cart: Cart = Cart.objects.filter(user_id=user.id).first()
+        cart.add_item(product, quantity)
+
+    def flush(self, user):
+        pass
+
+    def flush_pending(self) -> int:
+        return 0
+
+
+class RedisCartStore(BaseCartStore):
+    """
+        Keeps the not yet persisted quantities of each INITIAL cart in a redis hash
+        (product id -> quantity) and writes them back to Cart/OrderItem in batches.
+    """
+    dirty_key = 'cart:dirty'
+
+    # subtract what has been persisted, so adds that arrive during a flush are kept
+    release_script = """
+        for i = 1, #ARGV, 2 do
+            if redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1])) <= 0 then
+                redis.call('HDEL', KEYS[1], ARGV[i])
+            end
+        end
+        return redis.call('HLEN', KEYS[1])
+    """
+
+    def __init__(self):
+        self.redis = get_redis()
+        self.release = self.redis.register_script(self.release_script)
+
+    @staticmethod
+    def lines_key(user_id) -> str:
+        return f'cart:{user_id}:lines'
+
+    @staticmethod
+    def lock_key(user_id) -> str:
+        return f'cart:{user_id}:flush'
+
+    def add_item(self, user, product: Product, quantity: int):
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self.lines_key(user.id), product.id, quantity)
+        pipe.sadd(self.dirty_key, user.id)
+        pipe.execute()
+        bump_cart_version(user.id)
+
+    async def aadd_item(self, user, product: Product, quantity: int):
+        pipe = get_async_redis().pipeline()
+        pipe.hincrby(self.lines_key(user.id), product.id, quantity)
+        pipe.sadd(self.dirty_key, user.id)
+        await pipe.execute()
+        await abump_cart_version(user.id)
+
+    def flush(self, user):
+        self.flush_user(user.id)
+
+    def flush_user(self, user_id):
+        with self.redis.lock(self.lock_key(user_id), timeout=settings.CART_STORE_FLUSH_LOCK_TIMEOUT):
+            lines = self.redis.hgetall(self.lines_key(user_id))
+            if not lines:
+                return
+            product_ids = Product.objects.filter(id__in=lines.keys()).values_list('id', flat=True)
+            cart = Cart.objects.filter(user_id=user_id, step=Cart.StepChoices.INITIAL).first()
+            if cart is None:
+                if not get_user_model().objects.filter(id=user_id).exists():
+                    logger.warning('user %s does not exist, the cart lines are kept', user_id)
+                    return
+                # e.g. a user created before every user had an initial cart
+                cart, _ = Cart.objects.get_or_create(user_id=user_id, step=Cart.StepChoices.INITIAL)
+            cart.add_items({product_id: int(lines[str(product_id)]) for product_id in product_ids})
+            args = []
+            for product_id, quantity in lines.items():
+                args.extend([product_id, quantity])
+            if self.release(keys=[self.lines_key(user_id)], args=args):
+                self.redis.sadd(self.dirty_key, user_id)
+
+    def flush_pending(self) -> int:
+        user_ids = self.redis.spop(self.dirty_key, settings.CART_STORE_FLUSH_BATCH_SIZE) or []
+        for user_id in user_ids:
+            try:
+                self.flush_user(user_id)
+            except Exception:
+                logger.exception('could not flush cart of user %s', user_id)
+                self.redis.sadd(self.dirty_key, user_id)
+        return len(user_ids)
+
+
+def get_cart_store() -> BaseCartStore:
+    return import_string(settings.CART_STORE)()
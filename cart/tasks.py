@@ -2,19 +2,34 @@ from datetime import timedelta
 
 from celery import shared_task
 from django.conf import settings
-from django.db.models import F
 from django.utils import timezone
 
+from cart.expiry import cancel_orders, expire_due_orders
 from cart.models import Order
+from cart.stores import get_cart_store
+
+
+@shared_task
+def expire_orders():
+    return expire_due_orders()
 
 
 @shared_task
 def cancel_pending_orders():
+    # safety net for orders whose expiry could not be scheduled, canceled in chunks
     expire: int = settings.CART_ORDER_EXPIRE_TIME
     orders = Order.objects.filter(
         step=Order.StepChoices.PENDING,
         finalized_at__lte=timezone.now() - timedelta(seconds=expire)
     )
-    result = orders.update(step=Order.StepChoices.CANCELED)
-    return result
+    result = 0
+    while True:
+        canceled = cancel_orders(orders, settings.ORDER_EXPIRY_CHUNK_SIZE)
+        result += len(canceled)
+        if len(canceled) < settings.ORDER_EXPIRY_CHUNK_SIZE:
+            return result
 
+
+@shared_task
+def flush_cart_store():
+    return get_cart_store().flush_pending()
@@ -0,0 +1,85 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cart.models import Cart, Order
+from cart.tests.service import create_user
+from product.models import Product
+from utils.redis_client import get_redis
+
+
+class AsyncCartViewsTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.product = Product.objects.create(title="هندزفری", base_price=50000, profit_price=5000)
+        self.cart: Cart = self.user.get_initial_cart()
+        # the async client of django 4.0 takes headers by their plain names
+        self.auth = {'authorization': f'Bearer {RefreshToken.for_user(user=self.user).access_token}'}
+
+    async def test_cart_detail_matches_sync_view(self):
+        await sync_to_async(self.cart.add_item)(self.product, 2)
+        response = await self.async_client.get(reverse('cart:api:async_cart'), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sync_response = await sync_to_async(self.client.get)(reverse('cart:api:cart'), HTTP_AUTHORIZATION=self.auth['authorization'])
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+        self.assertEqual(response.json().get('item_count'), 2)
+
+    async def test_unchanged_cart_is_not_modified(self):
+        url = reverse('cart:api:async_cart')
+        etag = (await self.async_client.get(url, **self.auth))['ETag']
+        response = await self.async_client.get(url, if_none_match=etag, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_add_to_cart(self):
+        response = await self.async_client.post(
+            reverse('cart:api:async_add_to_cart'), {'product': self.product.id, 'quantity': 3},
+            content_type='application/json', **self.auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get(reverse('cart:api:async_cart'), **self.auth)
+        self.assertEqual(response.json().get('item_count'), 3)
+
+    @override_settings(CART_STORE='cart.stores.RedisCartStore', REDIS_URL='redis://localhost:6379/15')
+    async def test_add_to_cart_with_redis_store(self):
+        await sync_to_async(get_redis().flushdb)()
+        url = reverse('cart:api:async_add_to_cart')
+        await self.async_client.post(url, {'product': self.product.id}, content_type='application/json', **self.auth)
+        self.assertEqual(await sync_to_async(get_redis().hget)(f'cart:{self.user.id}:lines', self.product.id), '1')
+        response = await self.async_client.get(reverse('cart:api:async_cart'), **self.auth)
+        self.assertEqual(response.json().get('item_count'), 1)
+
+    async def test_add_unknown_product_fail(self):
+        response = await self.async_client.post(
+            reverse('cart:api:async_add_to_cart'), {'product': 0}, content_type='application/json', **self.auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_order_list(self):
+        await sync_to_async(Order.objects.create)(user=self.user, step=Cart.StepChoices.PENDING)
+        response = await self.async_client.get(reverse('cart:api:async_order_list'), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().get('count'), 1)
+        self.assertEqual(response.json().get('results')[0].get('step'), 'pending')
+
+    async def test_unauthorized_fail(self):
+        response = await self.async_client.get(reverse('cart:api:async_cart'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+    async def test_deactivated_user_fail(self):
+        self.user.is_active = False
+        await sync_to_async(self.user.save)()
+        response = await self.async_client.get(reverse('cart:api:async_cart'), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json().get('detail'), 'User is inactive')
+
+    async def test_wrong_method_fail(self):
+        response = await self.async_client.delete(reverse('cart:api:async_cart'), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
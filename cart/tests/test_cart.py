@@ -1,10 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from cart.models import Cart, OrderItem
+from cart.models.order_item import MAX_QUANTITY
 from cart.tests.service import create_user
 from product.models import Product
 
@@ -14,6 +18,7 @@ User = get_user_model()
 class CartTest(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = create_user('mahsa', 'mah61700250185')
         self.product1 = Product.objects.create(
             title="گوشی موبایل",
@@ -83,6 +88,31 @@ class CartTest(APITestCase):
         cart_price = sum([3 * item.product.get_price() for item in self.cart.orderitems.all()])
         self.assertEqual(self.cart.get_cart_price(), cart_price)
 
+    def test_add_too_many_fail(self):
+        url = reverse('cart:api:add_or_remove_from_cart')
+        for quantity in (0, MAX_QUANTITY + 1):
+            response = self.client.post(url, {'product': self.product1.id, 'quantity': quantity})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.cart.orderitems.count(), 0)
+
+    def test_added_quantities_stop_at_the_limit_success(self):
+        url = reverse('cart:api:add_or_remove_from_cart')
+        for _ in range(2):
+            response = self.client.post(url, {'product': self.product1.id, 'quantity': MAX_QUANTITY})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('cart:api:batch_manage_cart'), {'operations': [
+            {'action': 'add', 'product': self.product2.id, 'quantity': MAX_QUANTITY},
+            {'action': 'add', 'product': self.product2.id, 'quantity': MAX_QUANTITY},
+        ]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart.orderitems.get(product=self.product1).quantity, MAX_QUANTITY)
+        self.assertEqual(self.cart.orderitems.get(product=self.product2).quantity, MAX_QUANTITY)
+
+    def test_add_to_a_line_without_quantity_success(self):
+        self.cart.orderitems.create(product=self.product1, quantity=None)
+        self.cart.add_item(self.product1, 2)
+        self.assertEqual(self.cart.orderitems.get(product=self.product1).quantity, 2)
+
     def test_add_another_product_success(self):
         self.cart.orderitems.create(product=self.product1)
         self.cart.refresh_from_db()
@@ -119,6 +149,132 @@ class CartTest(APITestCase):
         self.assertEqual(order_items_count, 0)
         self.assertEqual(self.cart.get_cart_price(), 0)
 
+    def test_add_items_in_one_query_success(self):
+        self.cart.orderitems.create(product=self.product1, quantity=2)
+        with self.assertNumQueries(1):
+            self.cart.add_items({self.product1.id: 3, self.product2.id: 1})
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.orderitems.count(), 2)
+        self.assertEqual(self.cart.orderitems.get(product=self.product1).quantity, 5)
+        self.assertEqual(self.cart.orderitems.get(product=self.product2).quantity, 1)
+
+    def test_duplicate_order_item_fail(self):
+        self.cart.orderitems.create(product=self.product1)
+        with self.assertRaises(IntegrityError):
+            self.cart.orderitems.create(product=self.product1)
+
+    def test_batch_manage_cart_success(self):
+        self.cart.orderitems.create(product=self.product1, quantity=2)
+        product3 = Product.objects.create(title="کابل", base_price=10000, profit_price=1000)
+        url = reverse('cart:api:batch_manage_cart')
+        data = {
+            'operations': [
+                {'action': 'set', 'product': self.product1.id, 'quantity': 4},
+                {'action': 'add', 'product': self.product2.id, 'quantity': 2},
+                {'action': 'add', 'product': product3.id},
+                {'action': 'remove', 'product': product3.id},
+                {'action': 'add', 'product': self.product2.id},
+            ]
+        }
+        response = self.client.post(url, data)
+        self.cart.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart.orderitems.count(), 2)
+        self.assertEqual(self.cart.orderitems.get(product=self.product1).quantity, 4)
+        self.assertEqual(self.cart.orderitems.get(product=self.product2).quantity, 3)
+        self.assertEqual(response.data['cart_price'], self.cart.get_cart_price())
+        self.assertEqual(response.data['item_count'], 7)
+
+    def test_batch_manage_cart_remove_success(self):
+        self.cart.orderitems.create(product=self.product1, quantity=2)
+        self.cart.orderitems.create(product=self.product2, quantity=1)
+        url = reverse('cart:api:batch_manage_cart')
+        data = {
+            'operations': [
+                {'action': 'remove', 'product': self.product1.id},
+                {'action': 'set', 'product': self.product2.id, 'quantity': 0},
+            ]
+        }
+        response = self.client.post(url, data)
+        self.cart.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart.orderitems.count(), 0)
+        self.assertEqual(response.data['cart_price'], 0)
+
+    def test_batch_manage_cart_with_unknown_product_fail(self):
+        url = reverse('cart:api:batch_manage_cart')
+        data = {
+            'operations': [
+                {'action': 'add', 'product': self.product1.id},
+                {'action': 'add', 'product': 100000},
+            ]
+        }
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.cart.orderitems.count(), 0)
+
+    def test_batch_manage_cart_query_count_does_not_depend_on_lines(self):
+        products = [
+            Product.objects.create(title=f'product {i}', slug=f'product-{i}', base_price=1000)
+            for i in range(20)
+        ]
+        url = reverse('cart:api:batch_manage_cart')
+
+        def post(items):
+            data = {'operations': [{'action': 'add', 'product': product.id} for product in items]}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(post(products[:2]), post(products[2:]))
+
+    def test_cart_totals_follow_order_items_success(self):
+        self.product1.refresh_from_db()
+        self.product2.refresh_from_db()
+        self.cart.add_item(self.product2, 2)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, 2 * self.product2.get_price())
+        self.assertEqual(self.cart.item_count, 2)
+        self.assertFalse(self.cart.has_fragile_item)
+
+        self.cart.add_items({self.product1.id: 1, self.product2.id: 1})
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, self.cart.get_cart_price())
+        self.assertEqual(self.cart.item_count, 4)
+        self.assertTrue(self.cart.has_fragile_item)
+
+        self.cart.orderitems.filter(product=self.product1).delete()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, 3 * self.product2.get_price())
+        self.assertEqual(self.cart.item_count, 3)
+        self.assertFalse(self.cart.has_fragile_item)
+
+    def test_cart_totals_follow_product_changes_success(self):
+        self.cart.add_items({self.product1.id: 1, self.product2.id: 3})
+        self.product1.refresh_from_db()
+        self.product2.refresh_from_db()
+        self.product2.profit_price = 7000
+        self.product2.is_fragile = True
+        self.product2.save()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, self.product1.get_price() + 3 * 57000)
+        self.assertEqual(self.cart.subtotal, self.cart.get_cart_price())
+
+        self.cart.orderitems.filter(product=self.product1).delete()
+        self.cart.refresh_from_db()
+        self.assertTrue(self.cart.has_fragile_item)
+
+    def test_full_save_keeps_cart_totals_success(self):
+        stale = Cart.objects.get(id=self.cart.id)
+        self.cart.add_items({self.product1.id: 1, self.product2.id: 2})
+        stale.description = 'leave it at the door'
+        stale.save()
+        self.cart.refresh_totals()
+        self.assertEqual(self.cart.item_count, 3)
+        self.assertEqual(self.cart.subtotal, 3500000 + 2 * 55000)
+        self.assertTrue(self.cart.has_fragile_item)
+
     def test_decrement_order_item_success(self):
         pass
 
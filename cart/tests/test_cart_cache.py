@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.models import Cart, Order
+from cart.tests.service import create_user
+from product.models import Product
+from shipping.models import Shipping
+
+
+class CartCacheTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.product1 = Product.objects.create(title="گوشی موبایل", base_price=3000000, profit_price=500000)
+        self.product2 = Product.objects.create(title="هندزفری", base_price=50000, profit_price=5000)
+        refresh = RefreshToken.for_user(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.cart: Cart = self.user.get_initial_cart()
+        self.cart.add_item(self.product1, 1)
+        self.url = reverse('cart:api:cart')
+
+    def test_unchanged_cart_is_read_without_sql(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.data.get('item_count'), 1)
+
+    def test_deactivated_user_is_refused(self):
+        self.client.get(self.url)
+        order = Order.objects.create(user=self.user, step=Cart.StepChoices.PENDING)
+        self.user.is_active = False
+        self.user.save()
+        urls = [self.url, reverse('cart:api:order_list'), reverse('cart:api:order_detail', args=[order.id])]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(response.data.get('detail').code, 'user_inactive')
+
+    def test_deleted_user_is_refused(self):
+        self.client.get(self.url)
+        Cart.objects.filter(user=self.user).delete()
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_add_item_invalidates(self):
+        self.client.get(self.url)
+        self.client.post(reverse('cart:api:add_or_remove_from_cart'), {'product': self.product2.id, 'quantity': 2})
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data.get('orderitems')), 2)
+        self.assertEqual(response.data.get('item_count'), 3)
+
+    def test_remove_item_invalidates(self):
+        self.client.get(self.url)
+        order_item = self.cart.orderitems.get()
+        self.client.delete(reverse('cart:api:add_or_remove_from_cart'), {'order_item': order_item.id})
+        response = self.client.get(self.url)
+        self.assertEqual(response.data.get('orderitems'), [])
+        self.assertEqual(response.data.get('cart_price'), 0)
+
+    def test_batch_invalidates(self):
+        self.client.get(self.url)
+        self.client.post(
+            reverse('cart:api:batch_manage_cart'),
+            {'operations': [{'action': 'set', 'product': self.product1.id, 'quantity': 4}]},
+        )
+        self.assertEqual(self.client.get(self.url).data.get('item_count'), 4)
+
+    def test_price_change_invalidates(self):
+        self.client.get(self.url)
+        self.product1.base_price = 1000000
+        self.product1.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data.get('cart_price'), self.product1.price)
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def test_finalize_invalidates(self, mock_is_between):
+        Shipping.objects.create(type='regular', price=10000)
+        Shipping.objects.create(type='express', price=20000)
+        address = Address.objects.create(user=self.user, province='Tehran', city='tehran', address='somewhere')
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('cart:api:finalize_cart'), {'address': address.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data.get('orderitems'), [])
+        self.assertEqual(response.data.get('item_count'), 0)
+
+    def test_carts_of_users_are_cached_apart(self):
+        self.client.get(self.url)
+        other_user = create_user('sara', 'sar61700250185')
+        other_user.get_initial_cart().add_item(self.product2, 5)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user=other_user).access_token}')
+        self.assertEqual(self.client.get(self.url).data.get('item_count'), 5)
+
+    def test_unchanged_cart_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        cache.delete(f'cart:{self.user.id}:payload')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_changed_cart_is_sent_again(self):
+        etag = self.client.get(self.url)['ETag']
+        self.cart.add_item(self.product2, 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('item_count'), 2)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,117 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.models import Cart
+from cart.stores import get_cart_store
+from cart.tests.service import create_user
+from product.models import Product
+from shipping.models import Shipping
+from utils.redis_client import get_redis
+
+
+@override_settings(
+    CART_STORE='cart.stores.RedisCartStore',
+    REDIS_URL='redis://localhost:6379/15',
+)
+class RedisCartStoreTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_redis().flushdb()
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.product1 = Product.objects.create(
+            title="گوشی موبایل",
+            description="توضیحات ندارد",
+            is_fragile=True,
+            base_price=3000000,
+            profit_price=500000
+        )
+        self.product2 = Product.objects.create(
+            title="هندزفری",
+            description="توضیحات ندارد",
+            is_fragile=False,
+            base_price=50000,
+            profit_price=5000
+        )
+        refresh = RefreshToken.for_user(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.cart: Cart = self.user.get_initial_cart()
+
+    def test_add_to_cart_does_not_write_order_items(self):
+        url = reverse('cart:api:add_or_remove_from_cart')
+        response = self.client.post(url, {'product': self.product1.id, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart.orderitems.count(), 0)
+        self.assertEqual(get_redis().hget(f'cart:{self.user.id}:lines', self.product1.id), '2')
+
+    def test_get_cart_flushes_pending_items(self):
+        url = reverse('cart:api:add_or_remove_from_cart')
+        self.client.post(url, {'product': self.product1.id, 'quantity': 2})
+        self.client.post(url, {'product': self.product1.id, 'quantity': 1})
+        self.client.post(url, {'product': self.product2.id})
+        response = self.client.get(reverse('cart:api:cart'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data.get('orderitems')), 2)
+        self.assertEqual(self.cart.orderitems.get(product=self.product1).quantity, 3)
+        self.assertEqual(response.data.get('cart_price'), 3 * self.product1.get_price() + self.product2.get_price())
+        self.assertFalse(get_redis().exists(f'cart:{self.user.id}:lines'))
+
+    def test_flush_pending_writes_every_dirty_cart(self):
+        other_user = create_user('sara', 'sar61700250185')
+        store = get_cart_store()
+        store.add_item(self.user, self.product1, 1)
+        store.add_item(other_user, self.product2, 4)
+        self.assertEqual(store.flush_pending(), 2)
+        self.assertEqual(self.cart.orderitems.get().quantity, 1)
+        self.assertEqual(other_user.get_initial_cart().orderitems.get().quantity, 4)
+        self.assertEqual(store.flush_pending(), 0)
+
+    def test_flush_adds_to_existing_order_item(self):
+        self.cart.orderitems.create(product=self.product1, quantity=2)
+        store = get_cart_store()
+        store.add_item(self.user, self.product1, 3)
+        store.flush(self.user)
+        self.assertEqual(self.cart.orderitems.get().quantity, 5)
+
+    def test_flush_creates_a_missing_initial_cart(self):
+        self.cart.delete()
+        store = get_cart_store()
+        store.add_item(self.user, self.product1, 2)
+        self.assertEqual(store.flush_pending(), 1)
+        self.assertEqual(self.user.get_initial_cart().orderitems.get().quantity, 2)
+
+    def test_flush_skips_deleted_users(self):
+        store = get_cart_store()
+        store.add_item(self.user, self.product1, 2)
+        user_id = self.user.id
+        Cart.objects.filter(user=self.user).delete()
+        self.user.delete()
+        with self.assertLogs('cart.stores', 'WARNING'):
+            self.assertEqual(store.flush_pending(), 1)
+        self.assertEqual(get_redis().hget(f'cart:{user_id}:lines', self.product1.id), '2')
+        self.assertEqual(store.flush_pending(), 0)
+
+    @patch('cart.models.cart.is_between')
+    def test_finalize_flushes_pending_items(self, mock_is_between):
+        mock_is_between.return_value = True
+        Shipping.objects.create(type='regular', price=10000)
+        Shipping.objects.create(type='express', price=20000)
+        address = Address.objects.create(
+            user=self.user,
+            province='Tehran',
+            city="tehran",
+            address='somewhere',
+            zip_code=1234567890, )
+        self.client.post(reverse('cart:api:add_or_remove_from_cart'), {'product': self.product1.id})
+        response = self.client.post(reverse('cart:api:finalize_cart'), {'address': address.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.step, 'pending')
+        self.assertEqual(self.cart.orderitems.get().price, self.product1.get_price())
@@ -1,13 +1,15 @@
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from account.models import Address
-from cart.models import Cart
+from cart.models import Cart, Order
 from cart.tests.service import create_user
 from discount.models import Discount
 from product.models import Product
@@ -221,6 +223,46 @@ class FinalizeCartTest(APITestCase):
         self.assertEqual(shipping_price, self.shipping2.price)
         self.assertEqual(self.cart.step, 'pending')
 
+    @patch('cart.models.cart.is_between')
+    def test_save_order_totals_success(self, mock_is_between):
+        mock_is_between.return_value = True
+        self.cart.orderitems.create(product=self.product1, quantity=2)
+        url = reverse('cart:api:finalize_cart')
+        data = {
+            'address': self.address.id,
+            'discount': 'test'
+        }
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order = Order.objects.get(id=self.cart.id)
+        self.assertEqual(order.items_total, 2 * self.product1.get_price())
+        self.assertEqual(order.discount_price, self.discount1.ceil)
+        self.assertEqual(order.total_after_discount, order.items_total - order.discount_price)
+        self.assertEqual(order.grand_total, order.total_after_discount + self.shipping2.price)
+
+    @patch('cart.models.cart.is_between')
+    def test_finalize_query_count_does_not_depend_on_cart_size(self, mock_is_between):
+        mock_is_between.return_value = True
+        url = reverse('cart:api:finalize_cart')
+
+        def finalize(products):
+            cart = self.user.get_initial_cart()
+            cart.add_items({product.id: 1 for product in products})
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {'address': self.address.id})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            cart.refresh_from_db()
+            for item in cart.orderitems.select_related('product'):
+                self.assertEqual(item.price, item.product.get_price())
+            return len(queries)
+
+        products = [
+            Product.objects.create(title=f'product {i}', slug=f'product-{i}', base_price=100000, profit_price=i, stock=5)
+            for i in range(30)
+        ]
+        finalize(products[:1])  # loads the shipping rates of this process
+        self.assertEqual(finalize(products[1:2]), finalize(products[2:]))
+
     @patch('cart.models.cart.is_between')
     def test_save_discount_price_in_order_success(self, mock_is_between):
         pass
@@ -0,0 +1,119 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection, transaction
+from django.test import override_settings, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.expiry import EXPIRY_KEY, expire_due_orders, schedule_order_expiry
+from cart.models import Cart, Order
+from cart.tasks import cancel_pending_orders
+from cart.tests.service import create_user
+from product.models import Product
+from shipping.models import Shipping
+from utils.redis_client import get_redis
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15')
+class OrderExpiryTest(APITestCase):
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.user = create_user('mahsa', 'mah61700250185')
+
+    def create_order(self, step=Cart.StepChoices.PENDING, minutes_ago=0) -> Order:
+        order = Order.objects.create(user=self.user, step=step)
+        Order.objects.filter(id=order.id).update(finalized_at=timezone.now() - timedelta(minutes=minutes_ago))
+        order.refresh_from_db()
+        return order
+
+    @patch('cart.models.cart.is_between')
+    def test_finalize_schedules_expiry(self, mock_is_between):
+        mock_is_between.return_value = True
+        Shipping.objects.create(type='express', price=20000)
+        product = Product.objects.create(title="گوشی موبایل", is_fragile=True, base_price=3000000)
+        address = Address.objects.create(user=self.user, province='Tehran', city='tehran', address='somewhere')
+        cart = self.user.get_initial_cart()
+        cart.add_item(product, 1)
+        refresh = RefreshToken.for_user(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('cart:api:finalize_cart'), {'address': address.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cart.refresh_from_db()
+        score = get_redis().zscore(EXPIRY_KEY, cart.id)
+        self.assertAlmostEqual(score, (cart.finalized_at + timedelta(seconds=60)).timestamp(), places=3)
+
+    def test_expire_due_orders(self):
+        due = self.create_order(minutes_ago=10)
+        not_due = self.create_order()
+        paid = self.create_order(step=Cart.StepChoices.PAID, minutes_ago=10)
+        for order in (due, not_due, paid):
+            schedule_order_expiry(order)
+        self.assertEqual(expire_due_orders(), 1)
+        due.refresh_from_db()
+        not_due.refresh_from_db()
+        paid.refresh_from_db()
+        self.assertEqual(due.step, Cart.StepChoices.CANCELED)
+        self.assertEqual(not_due.step, Cart.StepChoices.PENDING)
+        self.assertEqual(paid.step, Cart.StepChoices.PAID)
+        self.assertEqual(get_redis().zrange(EXPIRY_KEY, 0, -1), [str(not_due.id)])
+
+    @override_settings(ORDER_EXPIRY_CHUNK_SIZE=2)
+    def test_expire_due_orders_in_chunks(self):
+        orders = [self.create_order(minutes_ago=10) for _ in range(5)]
+        for order in orders:
+            schedule_order_expiry(order)
+        self.assertEqual(expire_due_orders(), 5)
+        self.assertEqual(Order.objects.filter(step=Cart.StepChoices.CANCELED).count(), 5)
+        self.assertEqual(get_redis().zcard(EXPIRY_KEY), 0)
+
+    @override_settings(ORDER_EXPIRY_CHUNK_SIZE=2)
+    def test_cancel_pending_orders_sweep(self):
+        orders = [self.create_order(minutes_ago=10) for _ in range(3)]
+        recent = self.create_order()
+        self.assertEqual(cancel_pending_orders(), 3)
+        self.assertEqual(Order.objects.filter(id__in=[order.id for order in orders], step='canceled').count(), 3)
+        recent.refresh_from_db()
+        self.assertEqual(recent.step, Cart.StepChoices.PENDING)
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15')
+class LockedOrderExpiryTest(TransactionTestCase):
+
+    def test_locked_order_is_skipped_and_retried(self):
+        get_redis().flushdb()
+        user = create_user('mahsa', 'mah61700250185')
+        order = Order.objects.create(user=user, step=Cart.StepChoices.PENDING)
+        Order.objects.filter(id=order.id).update(finalized_at=timezone.now() - timedelta(minutes=10))
+        order.refresh_from_db()
+        schedule_order_expiry(order)
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Order.objects.select_for_update().get(id=order.id)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        locked.wait(10)
+        try:
+            self.assertEqual(expire_due_orders(), 0)
+        finally:
+            release.set()
+            thread.join()
+        order.refresh_from_db()
+        self.assertEqual(order.step, Cart.StepChoices.PENDING)
+        self.assertGreater(get_redis().zscore(EXPIRY_KEY, order.id), timezone.now().timestamp())
+        self.assertEqual(expire_due_orders(now=timezone.now() + timedelta(seconds=10)), 1)
@@ -1,9 +1,16 @@
+from io import StringIO
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from cart.api.pagination import OrderKeysetPagination
 from cart.models import Cart, Order
 from cart.tests.service import create_user
 from product.models import Product
@@ -66,6 +73,103 @@ class OrdersTest(APITestCase):
         self.assertEqual(response.data.get('results')[0].get('order_price_with_shipping'),
                          self.order2.get_order_price_with_shipping())
 
+    def test_get_orders_list_query_count_does_not_depend_on_rows(self):
+        url = reverse('cart:api:order_list')
+
+        def get_list():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries), response
+
+        self.client.get(url)  # caches that the user is active
+        order = Order.objects.create(user=self.user, step=Cart.StepChoices.PAID, discount_price=1000, shipping_price=10000)
+        order.orderitems.create(product=self.product1, quantity=2, price=3500000)
+        queries_for_one, _ = get_list()
+        for _ in range(10):
+            order = Order.objects.create(user=self.user, step=Cart.StepChoices.PENDING, shipping_price=20000)
+            order.orderitems.create(product=self.product1, quantity=1, price=3500000)
+            order.orderitems.create(product=self.product2, quantity=3, price=52000)
+        queries_for_many, response = get_list()
+        self.assertEqual(queries_for_one, queries_for_many)
+        self.assertEqual(response.data.get('count'), 11)
+        first = response.data.get('results')[0]
+        self.assertEqual(first.get('order_price'), 3500000 + 3 * 52000)
+        self.assertEqual(first.get('order_price_with_shipping'), 3500000 + 3 * 52000 + 20000)
+
+    def test_get_orders_list_reads_frozen_totals(self):
+        order = Order.objects.create(
+            user=self.user,
+            step=Cart.StepChoices.PAID,
+            discount_price=1000,
+            shipping_price=10000,
+            items_total=70000,
+            total_after_discount=69000,
+            grand_total=79000,
+        )
+        order.orderitems.create(product=self.product1, quantity=1, price=3500000)
+        response = self.client.get(reverse('cart:api:order_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('results')[0].get('order_price'), 70000)
+        self.assertEqual(response.data.get('results')[0].get('order_price_after_discount'), 69000)
+        self.assertEqual(response.data.get('results')[0].get('order_price_with_shipping'), 79000)
+
+    def test_discount_never_takes_the_total_below_zero(self):
+        order = Order.objects.create(user=self.user, step=Cart.StepChoices.PAID, discount_price=9000, shipping_price=10000)
+        order.orderitems.create(product=self.product1, quantity=1, price=5000)
+        annotated = Order.objects.with_totals().get(id=order.id)
+        self.assertEqual(annotated.order_price_after_discount, 0)
+        self.assertEqual(annotated.order_price_with_shipping, 10000)
+        self.assertEqual(order.get_order_price_after_discount(), 0)
+        order.freeze_totals()
+        self.assertEqual((order.items_total, order.total_after_discount, order.grand_total), (5000, 0, 10000))
+
+    def test_backfill_order_totals(self):
+        order = Order.objects.create(user=self.user, step=Cart.StepChoices.PAID, discount_price=1000, shipping_price=10000)
+        order.orderitems.create(product=self.product1, quantity=2, price=3500000)
+        empty_order = Order.objects.create(user=self.user, step=Cart.StepChoices.CANCELED, shipping_price=20000)
+        call_command('backfill_order_totals', batch_size=1, stdout=StringIO())
+        order.refresh_from_db()
+        empty_order.refresh_from_db()
+        self.assertEqual(order.items_total, 7000000)
+        self.assertEqual(order.total_after_discount, 6999000)
+        self.assertEqual(order.grand_total, 7009000)
+        self.assertEqual(empty_order.items_total, 0)
+        self.assertEqual(empty_order.grand_total, 20000)
+        self.assertFalse(Cart.objects.filter(user=self.user, items_total__isnull=False).exists())
+
+    @patch.object(OrderKeysetPagination, 'page_size', 2)
+    def test_get_orders_list_with_cursor_success(self):
+        orders = [Order.objects.create(user=self.user, step=Cart.StepChoices.PAID) for _ in range(5)]
+        # two orders finalized at the same moment must neither be skipped nor repeated
+        Order.objects.filter(id__in=[orders[1].id, orders[2].id]).update(finalized_at=orders[1].finalized_at)
+        url = reverse('cart:api:order_list') + '?pagination=cursor'
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            self.assertLessEqual(len(response.data.get('results')), 2)
+            ids += [order.get('id') for order in response.data.get('results')]
+            url = response.data.get('next')
+        expected = Order.objects.filter(user=self.user).order_by('-finalized_at', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_get_orders_list_with_cursor_count_success(self):
+        Order.objects.create(user=self.user, step=Cart.StepChoices.PAID)
+        response = self.client.get(reverse('cart:api:order_list'), {'pagination': 'cursor', 'count': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('count'), 1)
+        self.assertIsNone(response.data.get('next'))
+
+    def test_get_orders_list_with_invalid_cursor_fail(self):
+        response = self.client.get(reverse('cart:api:order_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for position in (['2022-01-01T00:00:00+00:00', 'one'], ['yesterday', 1], [None, 1], [{}, []]):
+            cursor = OrderKeysetPagination.encode_cursor(position)
+            response = self.client.get(reverse('cart:api:order_list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
     def test_get_orders_list_unauthorized_fail(self):
         self.client.logout()
         url = reverse('cart:api:order_list')
@@ -127,3 +231,31 @@ class OrdersTest(APITestCase):
         url = reverse('cart:api:order_detail', kwargs={'pk': 100})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_order_detail_not_modified(self):
+        self.order = Order.objects.create(user=self.user, step=Cart.StepChoices.PENDING)
+        self.order.orderitems.create(product=self.product1, quantity=3, price=3500000)
+        url = reverse('cart:api:order_detail', kwargs={'pk': self.order.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_get_order_detail_etag_follows_step(self):
+        self.order = Order.objects.create(user=self.user, step=Cart.StepChoices.PENDING)
+        url = reverse('cart:api:order_detail', kwargs={'pk': self.order.pk})
+        etag = self.client.get(url)['ETag']
+        # cancel_orders changes the step without save()
+        Order.objects.filter(id=self.order.id).update(step=Cart.StepChoices.CANCELED)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('step'), 'canceled')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_get_order_detail_of_other_user_not_modified_fail(self):
+        other_order = Order.objects.create(user=create_user('sara', 'sar61700250185'), step=Cart.StepChoices.PENDING)
+        url = reverse('cart:api:order_detail', kwargs={'pk': other_order.pk})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
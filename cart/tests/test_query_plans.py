@@ -0,0 +1,56 @@
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from cart.models import Cart, Order, OrderItem
+from cart.tests.service import create_user
+from product.models import Product
+
+
+class HotQueryPlanTest(TestCase):
+    """
+        Sequential scans are disabled, so the planner only picks one when no index can serve the query.
+        Tables are tiny in tests, without this every plan would be a sequential scan.
+    """
+
+    def setUp(self):
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.product = Product.objects.create(title="هندزفری", base_price=50000)
+        self.cart: Cart = self.user.get_initial_cart()
+        self.cart.add_item(self.product, 1)
+        order = Order.objects.create(user=self.user, step=Cart.StepChoices.PENDING)
+        order.orderitems.create(product=self.product, price=50000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE cart_cart; ANALYZE cart_orderitem;')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name=None, sorted_by_index=False):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        if index_name:
+            self.assertIn(index_name, plan, plan)
+        if sorted_by_index:
+            self.assertNotIn('Sort', plan, plan)
+
+    def test_initial_cart_plan(self):
+        self.assertUsesIndex(Cart.objects.filter(user=self.user, step='initial'))
+        self.assertUsesIndex(Cart.objects.filter(user=self.user, step='initial').order_by(), 'unique_initial_cart')
+
+    def test_pending_orders_plan(self):
+        orders = Order.objects.filter(step=Order.StepChoices.PENDING, finalized_at__lte=timezone.now())
+        self.assertUsesIndex(orders, 'cart_pending_finalized_idx')
+
+    def test_order_item_of_cart_plan(self):
+        items = OrderItem.objects.filter(cart_id=self.cart.id, product_id=self.product.id)
+        self.assertUsesIndex(items, 'unique_cart_product')
+
+    def test_order_list_plan(self):
+        orders = Order.objects.with_totals().filter(user=self.user).order_by('-finalized_at', '-id')[:100]
+        self.assertUsesIndex(orders, 'cart_order_list_idx', sorted_by_index=True)
+
+    def test_order_list_keyset_page_plan(self):
+        last = Order.objects.filter(user=self.user).first()
+        orders = Order.objects.with_totals().filter(
+            user=self.user, finalized_at__lte=last.finalized_at,
+        ).exclude(finalized_at=last.finalized_at, id__gte=last.id).order_by('-finalized_at', '-id')[:100]
+        self.assertUsesIndex(orders, 'cart_order_list_idx', sorted_by_index=True)
@@ -0,0 +1,195 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.expiry import cancel_orders
+from cart.models import Cart, Order
+from cart.tests.service import create_user
+from product.models import Product
+from shipping.models import Shipping
+
+
+@patch('cart.models.cart.is_between', return_value=True)
+class StockReservationTest(APITestCase):
+
+    def setUp(self):
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.address = Address.objects.create(user=self.user, province='Tehran', city='tehran', address='somewhere')
+        Shipping.objects.create(type='regular', price=10000)
+        Shipping.objects.create(type='express', price=20000)
+        self.phone = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=3)
+        self.handsfree = Product.objects.create(title="هندزفری", base_price=50000, stock=1)
+        self.cable = Product.objects.create(title="کابل", base_price=10000)
+        refresh = RefreshToken.for_user(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.cart: Cart = self.user.get_initial_cart()
+
+    def finalize(self):
+        return self.client.post(reverse('cart:api:finalize_cart'), {'address': self.address.id})
+
+    def stock(self, product: Product):
+        product.refresh_from_db(fields=('stock',))
+        return product.stock
+
+    def test_finalize_reserves_stock(self, mock_is_between):
+        self.cart.add_items({self.phone.id: 2, self.handsfree.id: 1, self.cable.id: 5})
+        response = self.finalize()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock(self.phone), 1)
+        self.assertEqual(self.stock(self.handsfree), 0)
+        self.assertIsNone(self.stock(self.cable))
+        self.assertTrue(Order.objects.get(id=self.cart.id).stock_reserved)
+
+    def test_full_save_keeps_the_reserved_stock(self, mock_is_between):
+        stale = Product.objects.get(id=self.phone.id)
+        self.cart.add_items({self.phone.id: 2})
+        self.finalize()
+        stale.base_price = 3100000
+        stale.save()
+        self.assertEqual(self.stock(self.phone), 1)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.price, 3100000)
+
+    def test_full_save_of_a_changed_stock_fails(self, mock_is_between):
+        self.phone.stock = 10
+        with self.assertRaises(ValueError):
+            self.phone.save()
+        self.assertEqual(self.stock(self.phone), 3)
+
+    def test_track_stock(self, mock_is_between):
+        self.assertIsNone(self.cable.stock)
+        self.assertFalse(self.cable.adjust_stock(5))
+        self.assertFalse(self.cable.track_stock(-1))
+        self.assertTrue(self.cable.track_stock(5))
+        self.assertEqual(self.stock(self.cable), 5)
+        self.assertFalse(self.cable.track_stock(7))
+        self.assertTrue(self.cable.adjust_stock(-1))
+        self.cable.title = 'کابل شارژ'
+        self.cable.save()
+        self.assertEqual(self.stock(self.cable), 4)
+
+    def test_adjust_stock(self, mock_is_between):
+        self.assertTrue(self.phone.adjust_stock(2))
+        self.assertEqual(self.phone.stock, 5)
+        self.assertFalse(self.phone.adjust_stock(-6))
+        self.assertFalse(self.cable.adjust_stock(1))
+        self.assertEqual(self.stock(self.phone), 5)
+
+    def test_admin_adjusts_stock(self, mock_is_between):
+        admin = get_user_model().objects.create_superuser(username='admin', password='admin61700250185')
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:product_product_change', args=[self.phone.id]), {
+            'title': self.phone.title, 'slug': 'phone', 'base_price': 3000000, 'profit_price': 0,
+            'stock': 100, 'stock_change': -1,
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(self.stock(self.phone), 2)
+        # a product without tracked stock starts with stock_change
+        response = client.post(reverse('admin:product_product_change', args=[self.cable.id]), {
+            'title': self.cable.title, 'slug': 'cable', 'base_price': self.cable.base_price, 'profit_price': 0,
+            'stock_change': 20,
+        })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(self.stock(self.cable), 20)
+
+    def test_finalize_fails_when_any_line_is_short(self, mock_is_between):
+        self.cart.add_items({self.phone.id: 2, self.handsfree.id: 2})
+        response = self.finalize()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get('message'), 'not enough stock for هندزفری')
+        self.assertEqual(self.stock(self.phone), 3)
+        self.assertEqual(self.stock(self.handsfree), 1)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.step, Cart.StepChoices.INITIAL)
+
+    def test_cancel_releases_stock_once(self, mock_is_between):
+        self.cart.add_items({self.phone.id: 2, self.cable.id: 1})
+        self.finalize()
+        other_user = create_user('sara', 'sar61700250185')
+        other_order = Order.objects.create(user=other_user, step=Cart.StepChoices.PENDING)
+        other_order.orderitems.create(product=self.phone, quantity=1, price=3000000)
+        self.assertEqual(sorted(cancel_orders(Order.objects.all(), 10)), sorted([self.cart.id, other_order.id]))
+        self.assertEqual(self.stock(self.phone), 3)
+        Order.objects.release_stock([self.cart.id])
+        self.assertEqual(self.stock(self.phone), 3)
+
+
+class ConcurrentFinalizeTest(TransactionTestCase):
+    """ Real transactions on several connections, each finalize commits or rolls back on its own. """
+    buyers = 8
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def test_parallel_finalizes_never_oversell(self, mock_is_between):
+        Shipping.objects.create(type='regular', price=10000)
+        Shipping.objects.create(type='express', price=20000)
+        first = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=5)
+        second = Product.objects.create(title="هندزفری", base_price=50000, stock=100)
+        carts = []
+        for index in range(self.buyers):
+            user = create_user(f'user{index}', f'pass{index}6170025')
+            address = Address.objects.create(user=user, province='Tehran', city='tehran', address='somewhere')
+            cart = user.get_initial_cart()
+            # half of the carts list the products in the other order
+            cart.add_items({second.id: 1, first.id: 1} if index % 2 else {first.id: 1, second.id: 1})
+            carts.append((cart, address))
+        results = []
+        start = threading.Barrier(self.buyers)
+
+        def checkout(cart, address):
+            start.wait()
+            try:
+                cart.finalize(address, None)
+                results.append(True)
+            except ValidationError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=cart_address) for cart_address in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 5)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.stock, 0)
+        self.assertEqual(second.stock, 95)
+        self.assertEqual(Order.objects.filter(stock_reserved=True).count(), 5)
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def test_reservation_does_not_block_adding_the_product(self, mock_is_between):
+        Shipping.objects.create(type='regular', price=10000)
+        product = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=5)
+        buyer, other = create_user('mahsa', 'mah61700250185'), create_user('sara', 'sar61700250185')
+        address = Address.objects.create(user=buyer, province='Tehran', city='tehran', address='somewhere')
+        buyer.get_initial_cart().add_item(product, 1)
+        errors = []
+
+        def add_to_cart():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET lock_timeout = '2s'")
+                other.get_initial_cart().add_item(product, 1)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            buyer.get_initial_cart().finalize(address, None)
+            thread = threading.Thread(target=add_to_cart)
+            thread.start()
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(other.get_initial_cart().orderitems.get().product, product)
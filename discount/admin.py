@@ -1,12 +1,12 @@
 from django.contrib import admin
 from django.core.exceptions import ValidationError
 
-from discount.models import Discount
+from discount.models import Discount, DiscountRedemption
 
 
 @admin.register(Discount)
 class DiscountAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'start_date', 'exp_date', 'min_value')
+    list_display = ('__str__', 'start_date', 'exp_date', 'min_value', 'max_uses', 'max_uses_per_user')
     list_filter = ('start_date', 'exp_date', 'min_value')
 
     # def save_model(self, request, obj, form, change):
@@ -30,3 +30,9 @@ class DiscountAdmin(admin.ModelAdmin):
     #
     # def has_delete_permission(self, *args, **kwargs):
     #     return True
+
+
+@admin.register(DiscountRedemption)
+class DiscountRedemptionAdmin(admin.ModelAdmin):
+    list_display = ('discount', 'user', 'order', 'created')
+    raw_id_fields = ('user', 'order')
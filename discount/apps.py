@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DiscountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'discount'
+
+    def ready(self):
+        import discount.signals
+        from discount.services import compile_validator_chain
+        compile_validator_chain()
@@ -0,0 +1,45 @@
+# Generated by Django 4.0.6 on 2026-10-18 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cart', '0009_cart_stock_reserved'),
+        ('discount', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='max_uses',
+            field=models.PositiveIntegerField(blank=True, help_text='حداکثر تعداد استفاده از این کد (خالی یعنی نامحدود)', null=True),
+        ),
+        migrations.AddField(
+            model_name='discount',
+            name='max_uses_per_user',
+            field=models.PositiveIntegerField(blank=True, help_text='حداکثر تعداد استفاده هر کاربر از این کد (خالی یعنی نامحدود)', null=True),
+        ),
+        migrations.CreateModel(
+            name='DiscountRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('discount', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='discount.discount')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='discount_redemption', to='cart.cart')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discount_redemptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Discount Redemption',
+                'verbose_name_plural': 'Discount Redemptions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='discountredemption',
+            index=models.Index(fields=['discount', 'user'], name='discount_redemption_user_idx'),
+        ),
+    ]
@@ -42,6 +42,16 @@ class Discount(models.Model):
     is_active = models.BooleanField(
         default=True
     )
+    max_uses = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text='حداکثر تعداد استفاده از این کد (خالی یعنی نامحدود)'
+    )
+    max_uses_per_user = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text='حداکثر تعداد استفاده هر کاربر از این کد (خالی یعنی نامحدود)'
+    )
 
     class Meta:
         verbose_name = 'Discount'
@@ -57,6 +67,9 @@ class Discount(models.Model):
             raise ValidationError('you should send discount with percent or constant')
         super().save(*args, **kwargs)
 
+    def has_usage_limits(self) -> bool:
+        return self.max_uses is not None or self.max_uses_per_user is not None
+
     def estimate_discount_type(self):
         return 'percentage' if self.percentage else 'constant'
 
@@ -64,7 +77,7 @@ class Discount(models.Model):
         type_ = self.estimate_discount_type()
 
         if type_ == 'percentage':
-            discount_amount = cart.get_cart_price() * discount.percentage // 100
+            discount_amount = cart.subtotal * discount.percentage // 100
         else:
             discount_amount = discount.constant
 
@@ -75,4 +88,37 @@ class Discount(models.Model):
         return discount_amount
 
     def apply_discount(self, cart):
-        return cart.get_cart_price() - self.calculate_discount_amount(self, cart)
+        return cart.subtotal - self.calculate_discount_amount(self, cart)
+
+
+class DiscountRedemption(models.Model):
+    """
+        One row per order finalized with a discount code. Only inserted, so popular codes
+        never have a hot row; the limits are enforced with redis counters seeded from these rows.
+    """
+    discount = models.ForeignKey(
+        Discount,
+        on_delete=models.CASCADE,
+        related_name='redemptions',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='discount_redemptions',
+    )
+    order = models.OneToOneField(
+        'cart.Cart',
+        on_delete=models.CASCADE,
+        related_name='discount_redemption',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('discount', 'user'), name='discount_redemption_user_idx'),
+        )
+        verbose_name = 'Discount Redemption'
+        verbose_name_plural = 'Discount Redemptions'
+
+    def __str__(self):
+        return f'{self.discount.code} - {self.user}'
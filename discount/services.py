@@ -1,12 +1,52 @@
+import hashlib
+from collections import Counter
+from functools import lru_cache
+from typing import List, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 from cart.models import Cart
-from discount.models import Discount
+from discount.models import Discount, DiscountRedemption
+from utils.redis_client import get_redis
+
+MISSING_DISCOUNT = 'missing'
+
+
+def discount_cache_key(code: str) -> str:
+    return 'discount:' + hashlib.sha1(code.encode()).hexdigest()
+
+
+def get_discount_by_code(code: str) -> Union[Discount, None]:
+    """
+        Codes that do not exist are cached too (for a shorter time),
+        so brute forcing codes does not reach the database on every try.
+    """
+    key = discount_cache_key(code)
+    cached = cache.get(key)
+    if cached == MISSING_DISCOUNT:
+        return None
+    if cached is not None:
+        return cached
+    discount = Discount.objects.filter(code=code).first()
+    if discount:
+        cache.set(key, discount, settings.DISCOUNT_CACHE_TIMEOUT)
+    else:
+        cache.set(key, MISSING_DISCOUNT, settings.DISCOUNT_MISS_CACHE_TIMEOUT)
+    return discount
+
+
+def forget_discount_code(code: str):
+    cache.delete(discount_cache_key(code))
 
 
 class BaseDiscountValidator:
     Exception = ValidationError
+    # validators run by ascending order, so the cheap checks come before the ones that need the cart price
+    order = 0
 
     @classmethod
     def validate(cls, discount: Discount, cart: Cart):
@@ -23,12 +63,14 @@ class IsActiveValidator(BaseDiscountValidator):
 
 
 class MinCartPriceValidator(BaseDiscountValidator):
+    order = 10
+
     @classmethod
     def validate(cls, discount: Discount, cart: Cart):
         if not discount.min_value:
             return True
         if discount.min_value:
-            cart_total_price = cart.get_cart_price()
+            cart_total_price = cart.subtotal
             discount_min_value = discount.min_value
             if cart_total_price >= discount_min_value:
                 return True
@@ -37,6 +79,8 @@ class MinCartPriceValidator(BaseDiscountValidator):
 
 
 class ExpDateValidator(BaseDiscountValidator):
+    order = 1
+
     @classmethod
     def validate(cls, discount: Discount, cart: Cart):
         if not discount.exp_date:
@@ -45,3 +89,114 @@ class ExpDateValidator(BaseDiscountValidator):
             return True
         raise cls.Exception(
             {'message': 'Discount is expired'})
+
+
+validator_chain = []
+
+
+def compile_validator_chain():
+    # called once from DiscountConfig.ready instead of walking __subclasses__ on every request
+    validator_chain[:] = sorted(BaseDiscountValidator.__subclasses__(), key=lambda validator: validator.order)
+
+
+def run_discount_validators(discount: Discount, cart: Cart):
+    for Validator in validator_chain:
+        Validator.validate(discount, cart)
+
+
+# KEYS are the counters of a code, ARGV their limits (-1 for none) followed by the counter timeout.
+# Returns -1 when a counter has to be seeded first, 0 when a limit is reached and 1 once all are incremented.
+REDEEM_SCRIPT = """
+    local count = #KEYS
+    for i = 1, count do
+        if redis.call('EXISTS', KEYS[i]) == 0 then
+            return -1
+        end
+    end
+    for i = 1, count do
+        local limit = tonumber(ARGV[i])
+        if limit >= 0 and tonumber(redis.call('GET', KEYS[i])) >= limit then
+            return 0
+        end
+    end
+    for i = 1, count do
+        redis.call('INCR', KEYS[i])
+        redis.call('EXPIRE', KEYS[i], ARGV[count + 1])
+    end
+    return 1
+"""
+
+RELEASE_SCRIPT = """
+    for i = 1, #KEYS do
+        if tonumber(redis.call('GET', KEYS[i]) or '0') >= tonumber(ARGV[i]) then
+            redis.call('DECRBY', KEYS[i], ARGV[i])
+        end
+    end
+"""
+
+
+@lru_cache(maxsize=None)
+def redemption_scripts(client) -> tuple:
+    # registered once per redis client
+    return client.register_script(REDEEM_SCRIPT), client.register_script(RELEASE_SCRIPT)
+
+
+def redemption_counter_keys(discount_id: int, user_id: int) -> List[str]:
+    return [f'discount:{discount_id}:uses', f'discount:{discount_id}:user:{user_id}:uses']
+
+
+def redeem_discount(discount: Discount, order: Cart):
+    """
+        Counts the use of the code by the order and refuses it once max_uses or max_uses_per_user is reached.
+        The check and the increment are one redis script, so parallel finalizes of a popular code neither
+        wait on a database row nor go over the limit. Counters missing from redis (new or expired)
+        are seeded from the redemption rows. The counters are not rolled back with the transaction,
+        a caller that fails after this has to call release_discount_counters().
+    """
+    if discount.has_usage_limits():
+        redis = get_redis()
+        redeem, _ = redemption_scripts(redis)
+        keys = redemption_counter_keys(discount.id, order.user_id)
+        limits = [-1 if limit is None else limit for limit in (discount.max_uses, discount.max_uses_per_user)]
+        timeout = settings.DISCOUNT_REDEMPTION_COUNTER_TIMEOUT
+        result = redeem(keys=keys, args=[*limits, timeout])
+        if result == -1:
+            redemptions = DiscountRedemption.objects.filter(discount=discount)
+            pipe = redis.pipeline()
+            pipe.set(keys[0], redemptions.count(), nx=True, ex=timeout)
+            pipe.set(keys[1], redemptions.filter(user_id=order.user_id).count(), nx=True, ex=timeout)
+            pipe.execute()
+            result = redeem(keys=keys, args=[*limits, timeout])
+        if result != 1:
+            raise ValidationError({'message': 'this code has reached its usage limit'})
+    try:
+        DiscountRedemption.objects.create(discount=discount, user_id=order.user_id, order=order)
+    except BaseException:
+        release_discount_counters(discount, order.user_id)
+        raise
+
+
+def release_counters(released: Counter):
+    _, release = redemption_scripts(get_redis())
+    release(keys=list(released), args=list(released.values()))
+
+
+def release_discount_counters(discount: Discount, user_id: int):
+    # undoes the counting of redeem_discount() when its transaction does not commit
+    if discount.has_usage_limits():
+        release_counters(Counter(redemption_counter_keys(discount.id, user_id)))
+
+
+def release_discount_redemptions(order_ids: List[int]):
+    # the codes used by canceled orders can be used again
+    redemptions = DiscountRedemption.objects.filter(order_id__in=order_ids)
+    used = Counter(redemptions.values_list('discount_id', 'user_id'))
+    if not used:
+        return
+    redemptions.delete()
+    released = Counter()
+    for (discount_id, user_id), count in used.items():
+        total_key, user_key = redemption_counter_keys(discount_id, user_id)
+        released[total_key] += count
+        released[user_key] += count
+    transaction.on_commit(lambda: release_counters(released))
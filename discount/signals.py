@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from discount.models import Discount
+from discount.services import forget_discount_code
+
+
+@receiver(pre_save, sender=Discount)
+def remember_previous_code(sender, instance, **kwargs):
+    instance._previous_code = None
+    if instance.pk:
+        instance._previous_code = Discount.objects.filter(pk=instance.pk).values_list('code', flat=True).first()
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_discount_cache(sender, instance, **kwargs):
+    codes = {instance.code, getattr(instance, '_previous_code', None)} - {None}
+    forget_discount_codes(codes)
+    # again after commit, in case a request cached the old row before the change was visible
+    transaction.on_commit(lambda: forget_discount_codes(codes))
+
+
+def forget_discount_codes(codes):
+    for code in codes:
+        forget_discount_code(code)
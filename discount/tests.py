@@ -1,3 +1,173 @@
-from django.test import TestCase
+import threading
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.expiry import cancel_orders
+from cart.models import Order
+from cart.tests.service import create_user
+from discount.models import Discount, DiscountRedemption
+from discount.services import discount_cache_key, get_discount_by_code, validator_chain, IsActiveValidator, ExpDateValidator, \
+    MinCartPriceValidator
+from product.models import Product
+from shipping.models import Shipping
+from utils.redis_client import get_redis
+
+
+class DiscountCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.discount = Discount.objects.create(
+            percentage=10,
+            ceil=50000,
+            code='test',
+        )
+
+    def test_get_discount_from_cache(self):
+        self.assertEqual(get_discount_by_code('test'), self.discount)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_discount_by_code('test').percentage, 10)
+
+    def test_missing_code_is_cached(self):
+        self.assertIsNone(get_discount_by_code('wrong'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_discount_by_code('wrong'))
+
+    def test_cache_is_invalidated_on_save(self):
+        get_discount_by_code('test')
+        self.discount.is_active = False
+        self.discount.save()
+        self.assertFalse(get_discount_by_code('test').is_active)
+
+    def test_renamed_code_is_invalidated(self):
+        get_discount_by_code('test')
+        self.assertIsNone(get_discount_by_code('new'))
+        self.discount.code = 'new'
+        self.discount.save()
+        self.assertIsNone(get_discount_by_code('test'))
+        self.assertEqual(get_discount_by_code('new'), self.discount)
+
+    def test_cache_is_invalidated_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.discount.is_active = False
+            self.discount.save()
+            # cached from another connection, which still sees the committed row
+            cache.set(discount_cache_key('test'), Discount(id=self.discount.id, code='test', is_active=True))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(get_discount_by_code('test').is_active)
+
+    def test_deleted_code_is_invalidated(self):
+        get_discount_by_code('test')
+        self.discount.delete()
+        self.assertIsNone(get_discount_by_code('test'))
+
+
+class DiscountValidatorChainTest(TestCase):
+
+    def test_cheap_validators_run_first(self):
+        self.assertEqual(validator_chain, [IsActiveValidator, ExpDateValidator, MinCartPriceValidator])
+
+
+def finalize_with_code(user, product, code):
+    user.get_initial_cart().add_item(product, 1)
+    address, _ = Address.objects.get_or_create(user=user, province='Tehran', city='tehran', address='somewhere')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user=user).access_token}')
+    return client.post(reverse('cart:api:finalize_cart'), {'address': address.id, 'discount': code})
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15')
+@patch('cart.models.cart.is_between', return_value=True)
+class DiscountUsageLimitTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_redis().flushdb()
+        Shipping.objects.create(type='regular', price=10000)
+        self.product = Product.objects.create(title="هندزفری", base_price=300000)
+        self.discount = Discount.objects.create(constant=10000, code='first2', max_uses=2, max_uses_per_user=1)
+        self.user = create_user('mahsa', 'mah61700250185')
+
+    def test_per_user_limit(self, mock_is_between):
+        self.assertEqual(finalize_with_code(self.user, self.product, 'first2').status_code, status.HTTP_200_OK)
+        response = finalize_with_code(self.user, self.product, 'first2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get('message'), 'this code has reached its usage limit')
+        self.assertEqual(self.user.get_initial_cart().orderitems.count(), 1)
+
+    def test_global_limit(self, mock_is_between):
+        users = [self.user, create_user('sara', 'sar61700250185'), create_user('ali', 'ali61700250185')]
+        codes = [finalize_with_code(user, self.product, 'first2').status_code for user in users]
+        self.assertEqual(codes, [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST])
+        self.assertEqual(self.discount.redemptions.count(), 2)
+
+    def test_unlimited_codes_do_not_use_redis(self, mock_is_between):
+        Discount.objects.create(constant=10000, code='always')
+        self.assertEqual(finalize_with_code(self.user, self.product, 'always').status_code, status.HTTP_200_OK)
+        self.assertEqual(get_redis().dbsize(), 0)
+        self.assertEqual(DiscountRedemption.objects.get().user, self.user)
+
+    def test_counters_are_seeded_from_redemptions(self, mock_is_between):
+        finalize_with_code(self.user, self.product, 'first2')
+        get_redis().flushdb()
+        response = finalize_with_code(self.user, self.product, 'first2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_redis().get(f'discount:{self.discount.id}:uses'), '1')
+
+    def test_failed_finalize_gives_the_code_back(self, mock_is_between):
+        Product.objects.filter(id=self.product.id).update(stock=0)
+        response = finalize_with_code(self.user, self.product, 'first2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_redis().mget(f'discount:{self.discount.id}:uses',
+                                          f'discount:{self.discount.id}:user:{self.user.id}:uses'), ['0', '0'])
+        self.assertFalse(DiscountRedemption.objects.exists())
+
+    def test_canceled_order_gives_the_code_back(self, mock_is_between):
+        finalize_with_code(self.user, self.product, 'first2')
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_orders(Order.objects.all(), 10)
+        self.assertFalse(DiscountRedemption.objects.exists())
+        self.assertEqual(get_redis().get(f'discount:{self.discount.id}:user:{self.user.id}:uses'), '0')
+        self.assertEqual(finalize_with_code(self.user, self.product, 'first2').status_code, status.HTTP_200_OK)
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15')
+class DiscountHammerTest(TransactionTestCase):
+    buyers = 12
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def test_parallel_finalizes_respect_the_limit(self, mock_is_between):
+        cache.clear()
+        get_redis().flushdb()
+        Shipping.objects.create(type='regular', price=10000)
+        product = Product.objects.create(title="هندزفری", base_price=300000)
+        discount = Discount.objects.create(constant=10000, code='first5', max_uses=5)
+        users = [create_user(f'user{index}', f'pass{index}6170025') for index in range(self.buyers)]
+        statuses = []
+        start = threading.Barrier(self.buyers)
+
+        def buyer(user):
+            try:
+                start.wait()
+                statuses.append(finalize_with_code(user, product, 'first5').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses.count(status.HTTP_200_OK), 5)
+        self.assertEqual(statuses.count(status.HTTP_400_BAD_REQUEST), self.buyers - 5)
+        self.assertEqual(discount.redemptions.count(), 5)
+        self.assertEqual(Order.objects.filter(discount=discount).count(), 5)
@@ -10,9 +10,21 @@ celery_app.config_from_object('django.conf:settings', namespace='CELERY')
 celery_app.autodiscover_tasks()
 
 celery_app.conf.beat_schedule = {
+    'expire-orders': {
+        'task': 'cart.tasks.expire_orders',
+        'schedule': 2.0,
+    },
     'cancel-pending-orders': {
         'task': 'cart.tasks.cancel_pending_orders',
-        'schedule': 30.0,
+        'schedule': 600.0,
+    },
+    'reconcile-flash-sales': {
+        'task': 'product.tasks.reconcile_flash_sales',
+        'schedule': 5.0,
+    },
+    'flush-cart-store': {
+        'task': 'cart.tasks.flush_cart_store',
+        'schedule': 5.0,
     },
 }
 celery_app.conf.timezone = 'Asia/Tehran'
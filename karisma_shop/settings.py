@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta, time
 from pathlib import Path
 
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'account',
@@ -43,6 +45,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.db_router.ReplicaReadMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,12 +77,46 @@ WSGI_APPLICATION = 'karisma_shop.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'utils.pooled_postgresql',
         'NAME': 'karisma',
         'USER': 'postgres',
         'PASSWORD': 123456,
         'HOST': 'localhost',
-        'PORT': 5432
+        'PORT': 5432,
+        # connections go back to the pool at the end of every request
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': 20,  # per process, keep workers * MAX_SIZE below max_connections
+            'TIMEOUT': 5,  # seconds to wait for a free connection
+            'CHECK_IDLE_AFTER': 30,  # seconds idle before a connection is checked on checkout
+            'MAX_LIFETIME': 60 * 60,  # seconds, then the connection is closed instead of reused
+        },
+    }
+}
+# a streaming replica of default, only used when its host is configured
+if os.environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DATABASE_REPLICA_HOST'],
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+        'NAME': os.environ.get('DATABASE_REPLICA_NAME', DATABASES['default']['NAME']),
+        'POOL': {
+            **DATABASES['default']['POOL'],
+            'MAX_SIZE': 10,  # per process, against the max_connections of the replica
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['utils.db_router.PrimaryReplicaRouter']
+REPLICA_DATABASES = tuple(alias for alias in DATABASES if alias != 'default')  # none: everything reads the primary
+# the models whose reads may go to a replica: order history, products and profiles
+REPLICA_READ_MODELS = ('cart.order', 'product.product', 'account.customuser', 'account.address')
+REPLICA_PIN_SECONDS = 10  # a user reads from the primary for this long after a write, keep it above the replica lag
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/2',
     }
 }
 
@@ -171,6 +208,27 @@ FINALIZE_CART_PERIOD = {
     'end': time(17, 0, 0),
 }
 CART_ORDER_EXPIRE_TIME = 60 # minutes
+ORDER_EXPIRY_CHUNK_SIZE = 500
+ORDER_EXPIRY_RETRY_DELAY = 5  # seconds, for orders locked by another transaction when they expire
+DISCOUNT_CACHE_TIMEOUT = 60  # seconds
+DISCOUNT_MISS_CACHE_TIMEOUT = 10  # seconds, for codes that do not exist
+DISCOUNT_REDEMPTION_COUNTER_TIMEOUT = 24 * 60 * 60  # seconds, counters are seeded again from the database after it
+CATALOG_CACHE_TIMEOUT = 60 * 60  # seconds, entries are also dropped whenever a product changes
+CART_CACHE_TIMEOUT = 10 * 60  # seconds, entries are also dropped whenever the cart or the catalog changes
+USER_ACTIVE_CACHE_TIMEOUT = 10 * 60  # seconds, entries are also dropped whenever the user is saved or deleted
+# postgres has no persian stemmer, 'simple' lowercases and indexes every word as is
+PRODUCT_SEARCH_CONFIG = 'simple'
+PRODUCT_EVENTS_MAXLEN = 10000
+AUTOCOMPLETE_REFRESH_INTERVAL = 1.0  # seconds
+AUTOCOMPLETE_MAX_RESULTS = 10
+FLASH_SALE_SHARDS = 8
+
+REDIS_URL = 'redis://localhost:6379/1'
+
+# 'cart.stores.RedisCartStore' keeps add-to-cart writes in redis and flushes them to the database in batches
+CART_STORE = 'cart.stores.DatabaseCartStore'
+CART_STORE_FLUSH_BATCH_SIZE = 500
+CART_STORE_FLUSH_LOCK_TIMEOUT = 10  # seconds
 
 CELERY_BROKER_URL = 'redis://localhost:6379'
 CELERY_RESULT_BACKEND = 'rpc://'
@@ -3,11 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from utils.pooled_postgresql.views import DatabasePoolStatsAPIView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('account.urls')),
     path('api/', include('cart.urls')),
     path('api/', include('shipping.urls')),
+    path('api/', include('product.urls')),
+    path('api/db-pool-stats/', DatabasePoolStatsAPIView.as_view(), name='db_pool_stats'),
 ]
 
 if settings.DEBUG:
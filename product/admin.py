@@ -1,8 +1,62 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from rest_framework.exceptions import ValidationError
+
+from product.flash_sale import get_flash_sale_stock
 from product.models import Product
 
 
+class ProductAdminForm(forms.ModelForm):
+    stock_change = forms.IntegerField(
+        required=False,
+        help_text='به موجودی فعلی اضافه (یا با عدد منفی از آن کم) میشود. '
+                  'اگر موجودی این محصول کنترل نمیشود، موجودی اولیه آن میشود.'
+    )
+
+    class Meta:
+        model = Product
+        fields = '__all__'
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'is_fragile')
-    list_filter = ('is_fragile',)
+    form = ProductAdminForm
+    list_display = ('id', 'title', 'is_fragile', 'stock', 'flash_sale')
+    list_filter = ('is_fragile', 'flash_sale')
+    actions = ('start_flash_sale', 'end_flash_sale')
+
+    def get_readonly_fields(self, request, obj=None):
+        # the stock of a product changes while the form is open, it is only adjusted by stock_change
+        return ('stock',) if obj else ()
+
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        return fields if obj else [field for field in fields if field != 'stock_change']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        stock_change = form.cleaned_data.get('stock_change')
+        if not change or stock_change is None or stock_change == 0 and obj.stock is not None:
+            return
+        if obj.stock is None:
+            # starts tracking the stock, e.g. of a product added before stock was tracked
+            changed = obj.track_stock(stock_change)
+        else:
+            changed = obj.adjust_stock(stock_change)
+        if not changed:
+            self.message_user(request, f'the stock of {obj} was not changed', messages.WARNING)
+
+    @admin.action(description='Start flash sale')
+    def start_flash_sale(self, request, queryset):
+        flash_sale_stock = get_flash_sale_stock()
+        for product in queryset:
+            try:
+                flash_sale_stock.start(product)
+            except ValidationError:
+                self.message_user(request, f'{product} has no stock, it was not put on flash sale', messages.WARNING)
+
+    @admin.action(description='End flash sale')
+    def end_flash_sale(self, request, queryset):
+        flash_sale_stock = get_flash_sale_stock()
+        for product in queryset.filter(flash_sale=True):
+            flash_sale_stock.end(product)
@@ -0,0 +1,15 @@
+from rest_framework.filters import OrderingFilter
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """
+        ?ordering=price or ?ordering=-price, always followed by id so pages never overlap
+        and the (price, id) index serves the sort.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or ())
+        if not {'id', '-id'} & set(ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
@@ -0,0 +1,7 @@
+from utils.pagination import KeysetPagination
+
+
+class ProductSearchPagination(KeysetPagination):
+    # best match first, the id breaks ties between products with the same rank
+    ordering = ('-rank', '-id')
+    page_size = 20
@@ -0,0 +1,36 @@
+from rest_framework.serializers import ModelSerializer
+
+from product.models import Product
+
+
+class FieldsProjectionMixin:
+    """
+        Drops every field that is not in context['fields'] (from ?fields=id,title,price),
+        so only the requested ones are serialized and cached.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProductListSerializer(FieldsProjectionMixin, ModelSerializer):
+    class Meta:
+        model = Product
+        fields = (
+            'id',
+            'title',
+            'subtitle',
+            'slug',
+            'image',
+            'is_fragile',
+            'price',
+        )
+
+
+class ProductRetrieveSerializer(ProductListSerializer):
+    class Meta(ProductListSerializer.Meta):
+        fields = ProductListSerializer.Meta.fields + ('description',)
@@ -1,9 +1,13 @@
 from django.urls import path
 
+from product.api.views.product import ProductListAPIView, ProductRetrieveAPIView, ProductSearchAPIView, \
+    ProductAutocompleteAPIView
+
 app_name = 'api'
 
 urlpatterns = [
-    # path(''),
-
+    path('product-autocomplete/', ProductAutocompleteAPIView.as_view(), name='product_autocomplete'),
+    path('product-search/', ProductSearchAPIView.as_view(), name='product_search'),
+    path('products/', ProductListAPIView.as_view(), name='product_list'),
+    path('products/<str:slug>/', ProductRetrieveAPIView.as_view(), name='product_detail'),
 ]
-
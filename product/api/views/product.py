@@ -0,0 +1,92 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from product.api.filters import ProductOrderingFilter
+from product.api.pagination import ProductSearchPagination
+from product.api.serializers.product import ProductListSerializer, ProductRetrieveSerializer
+from product.autocomplete import product_autocomplete
+from product.models import Product
+from product.services import catalog_cache_key, CATALOG_CACHE_TIMEOUT
+from utils.db_router import read_from_primary
+from utils.http import cached_conditional_response
+
+
+class CatalogCacheMixin:
+    """
+        Serves the response from the catalog cache and answers conditional requests
+        (If-None-Match / If-Modified-Since) from it, so a hit runs no SQL at all.
+        Only the query params listed in cache_query_params are part of the cache key.
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    cache_query_params = ('fields',)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.request.query_params.get('fields')
+        context['fields'] = [field for field in fields.split(',') if field] if fields else None
+        return context
+
+    def get_cache_key(self, request, **kwargs) -> str:
+        params = {param: request.query_params.get(param) for param in self.cache_query_params}
+        return catalog_cache_key(self.__class__.__name__, kwargs, params)
+
+    def get(self, request, *args, **kwargs):
+        def build():
+            # stored under the catalog version for CATALOG_CACHE_TIMEOUT, a replica may not have the last change yet
+            with read_from_primary():
+                return super(CatalogCacheMixin, self).get(request, *args, **kwargs).data
+
+        return cached_conditional_response(request, self.get_cache_key(request, **kwargs), build, CATALOG_CACHE_TIMEOUT)
+
+
+class ProductListAPIView(CatalogCacheMixin, ListAPIView):
+    serializer_class = ProductListSerializer
+    queryset = Product.objects.defer('search_vector')
+    filter_backends = (DjangoFilterBackend, ProductOrderingFilter)
+    filterset_fields = {
+        'price': ('gte', 'lte'),
+        'is_fragile': ('exact',),
+    }
+    ordering_fields = ('price',)
+    ordering = ('id',)
+    cache_query_params = ('fields', 'limit', 'offset', 'ordering', 'price__gte', 'price__lte', 'is_fragile')
+
+
+class ProductRetrieveAPIView(CatalogCacheMixin, RetrieveAPIView):
+    serializer_class = ProductRetrieveSerializer
+    queryset = Product.objects.defer('search_vector')
+    lookup_field = 'slug'
+
+
+class ProductSearchAPIView(CatalogCacheMixin, ListAPIView):
+    serializer_class = ProductListSerializer
+    pagination_class = ProductSearchPagination
+    cache_query_params = ('q', 'fields', 'cursor', 'count')
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'message': 'Search text (q) is required'})
+        return Product.objects.search(text)
+
+
+class ProductAutocompleteAPIView(APIView):
+    """
+        Typeahead for the search box, answered from the in-memory prefix index without touching the database
+        once the index is built.
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            raise ValidationError({'message': 'limit must be a number'})
+        results = product_autocomplete.search(request.query_params.get('q', ''), limit)
+        return Response({'results': results})
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from typing import List
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from product.models import Product
+from utils.prefix_index import PrefixIndex
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+EVENTS_KEY = 'product:events'
+
+
+def publish_product_event(product: Product, deleted: bool = False):
+    """
+        Appends a change to the product events stream, which every worker's autocomplete index replays.
+        Called after the transaction commits; if redis is unavailable the workers pick the change up
+        with their next full rebuild.
+    """
+    fields = {'id': product.id, 'deleted': int(deleted), 'title': product.title or '', 'slug': product.slug or ''}
+    try:
+        get_redis().xadd(EVENTS_KEY, fields, maxlen=settings.PRODUCT_EVENTS_MAXLEN, approximate=True)
+    except Exception:
+        logger.exception('could not publish change of product %s', product.id)
+
+
+class ProductAutocomplete:
+    """
+        Title and slug prefix index of every product, kept in the memory of each worker.
+        It is built from the database in a background thread on first use (the database answers
+        meanwhile), then brought up to date from the product events stream at most every
+        AUTOCOMPLETE_REFRESH_INTERVAL seconds. When events were trimmed from the stream before
+        this worker read them, the index is rebuilt in the background while the old one keeps answering.
+    """
+
+    def __init__(self, rebuild_in_background: bool = True):
+        self.index = None
+        self.last_event_id = None
+        self.checked_at = 0.0
+        self.rebuilds = 0
+        self.rebuild_in_background = rebuild_in_background
+        self._rebuilding = False
+        # reentrant, a rebuild that is not in the background swaps the index in from refresh()
+        self._lock = threading.RLock()
+
+    def search(self, prefix: str, limit: int = None) -> List[dict]:
+        limit = min(limit or settings.AUTOCOMPLETE_MAX_RESULTS, settings.AUTOCOMPLETE_MAX_RESULTS)
+        with self._lock:
+            self.refresh()
+            if self.index is not None:
+                ids = self.index.search(prefix, limit)
+                return [{'id': id_, 'title': self.index.texts[id_][0], 'slug': self.index.texts[id_][1]} for id_ in ids]
+        return self.search_database(prefix, limit)
+
+    @staticmethod
+    def search_database(prefix: str, limit: int) -> List[dict]:
+        # until the index is built: only the start of the title or slug matches, not the start of every word
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        products = Product.objects.filter(Q(title__istartswith=prefix) | Q(slug__istartswith=prefix))
+        return list(products.order_by('title', 'id').values('id', 'title', 'slug')[:limit])
+
+    def refresh(self):
+        # called with the lock held
+        if time.monotonic() - self.checked_at < settings.AUTOCOMPLETE_REFRESH_INTERVAL:
+            return
+        if self.index is None:
+            self.start_rebuild()
+            return
+        try:
+            self.apply_events()
+        except Exception:
+            # serve the index as it is, the next refresh tries again
+            logger.exception('could not refresh the product autocomplete index')
+        self.checked_at = time.monotonic()
+
+    def start_rebuild(self):
+        # called with the lock held
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+        if self.rebuild_in_background:
+            threading.Thread(target=self.rebuild, name='product-autocomplete-rebuild', daemon=True).start()
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        try:
+            # remember the stream position first, so changes made during the build are replayed afterwards
+            latest = get_redis().xrevrange(EVENTS_KEY, count=1)
+            index = PrefixIndex()
+            index.build(
+                (id_, (title, slug)) for id_, title, slug in Product.objects.values_list('id', 'title', 'slug').iterator()
+            )
+        except Exception:
+            logger.exception('could not build the product autocomplete index')
+            with self._lock:
+                # the next try waits for the refresh interval
+                self.checked_at = time.monotonic()
+                self._rebuilding = False
+            return
+        finally:
+            if self.rebuild_in_background:
+                connection.close()
+        with self._lock:
+            self.index, self.last_event_id = index, latest[0][0] if latest else '0-0'
+            self.checked_at = 0.0
+            self.rebuilds += 1
+            self._rebuilding = False
+        logger.info('product autocomplete index built: %s', self.stats())
+
+    def apply_events(self):
+        redis = get_redis()
+        pipe = redis.pipeline()
+        pipe.xlen(EVENTS_KEY)
+        pipe.xrange(EVENTS_KEY, count=1)
+        pipe.xread({EVENTS_KEY: self.last_event_id})
+        length, oldest, streams = pipe.execute()
+        # the stream only loses events when it is trimmed, and then holds at least maxlen of them
+        trimmed = length >= settings.PRODUCT_EVENTS_MAXLEN
+        if trimmed and self.stream_id(oldest[0][0]) > self.stream_id(self.last_event_id):
+            self.start_rebuild()
+            return
+        for _, events in streams:
+            for event_id, fields in events:
+                if int(fields['deleted']):
+                    self.index.remove(int(fields['id']))
+                else:
+                    self.index.add(int(fields['id']), (fields['title'], fields['slug']))
+                self.last_event_id = event_id
+
+    @staticmethod
+    def stream_id(event_id: str) -> tuple:
+        milliseconds, sequence = event_id.split('-')
+        return int(milliseconds), int(sequence)
+
+    def stats(self) -> dict:
+        stats = self.index.stats() if self.index is not None else {}
+        stats.update(rebuilds=self.rebuilds, last_event_id=self.last_event_id)
+        return stats
+
+
+product_autocomplete = ProductAutocomplete()
@@ -0,0 +1,154 @@
+import logging
+import random
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from product.models import Product
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class FlashSaleStock:
+    """
+        Available stock of flash sale products, kept in redis instead of the product row.
+        The stock of a product is split over FLASH_SALE_SHARDS counters, so parallel
+        finalizes of the same product decrement different keys. The shards of a product share a
+        hash tag, so one script takes from all of them (on a cluster, products spread over the nodes).
+        Postgres follows with reconcile(), which writes the sum of the shards back in one UPDATE.
+    """
+    products_key = 'flash:products'
+
+    # takes ARGV[1] from the shards in KEYS, in their order, only when they hold enough together;
+    # returns how much it took from each shard, nothing when they are short
+    take_script = """
+        local wanted = tonumber(ARGV[1])
+        local available = {}
+        local total = 0
+        for i, key in ipairs(KEYS) do
+            available[i] = math.max(tonumber(redis.call('GET', key) or '0'), 0)
+            total = total + available[i]
+        end
+        if total < wanted then
+            return {}
+        end
+        local taken = {}
+        for i, key in ipairs(KEYS) do
+            taken[i] = math.min(available[i], wanted)
+            if taken[i] > 0 then
+                redis.call('DECRBY', key, taken[i])
+                wanted = wanted - taken[i]
+            end
+        end
+        return taken
+    """
+
+    def __init__(self):
+        self.redis = get_redis()
+        self.take_from_shards = self.redis.register_script(self.take_script)
+
+    @staticmethod
+    def shard_key(product_id, shard: int) -> str:
+        # the {product_id} hash tag keeps the shards of a product in one cluster slot, for take_script
+        return f'flash:stock:{{{product_id}}}:{shard}'
+
+    def shard_keys(self, product_id) -> List[str]:
+        return [self.shard_key(product_id, shard) for shard in range(settings.FLASH_SALE_SHARDS)]
+
+    @transaction.atomic
+    def start(self, product: Product):
+        """ Moves the stock of the product to redis; from now on finalize reserves it there. """
+        product = Product.objects.select_for_update().get(id=product.id)
+        if product.flash_sale:
+            return
+        if product.stock is None:
+            raise ValidationError({'message': 'a flash sale needs the stock of the product'})
+        shards = settings.FLASH_SALE_SHARDS
+        stock = product.stock
+        pipe = self.redis.pipeline()
+        for shard, key in enumerate(self.shard_keys(product.id)):
+            pipe.set(key, stock // shards + (1 if shard < stock % shards else 0))
+        pipe.sadd(self.products_key, product.id)
+        pipe.execute()
+        Product.objects.filter(id=product.id).update(flash_sale=True)
+
+    @transaction.atomic
+    def end(self, product: Product):
+        """ Writes the remaining stock back to the product row and stops reserving in redis. """
+        # FOR UPDATE waits for the carts holding the product (Cart.reserve_stock), so no take is
+        # still running when the shards are summed, and the next carts reserve the row instead
+        product = Product.objects.select_for_update().get(id=product.id)
+        if not product.flash_sale:
+            return
+        Product.objects.filter(id=product.id).update(flash_sale=False)
+        self.reconcile([product.id], flash_sale_only=False)
+        pipe = self.redis.pipeline()
+        pipe.delete(*self.shard_keys(product.id))
+        pipe.srem(self.products_key, product.id)
+        pipe.execute()
+
+    def available(self, product_id) -> int:
+        return sum(int(value or 0) for value in self.redis.mget(self.shard_keys(product_id)))
+
+    def take(self, quantities: Dict[int, int]) -> List[int]:
+        """
+            Takes {product_id: quantity} from the shards, one script per product, starting at a random shard
+            and moving on to the next ones only when it runs dry. It is all or nothing: when any product is
+            short everything taken is put back and the short product ids are returned.
+        """
+        taken, short = [], []
+        for product_id, quantity in quantities.items():
+            keys = self.shard_keys(product_id)
+            start = random.randrange(len(keys))
+            keys = keys[start:] + keys[:start]
+            amounts = self.take_from_shards(keys=keys, args=[quantity])
+            if amounts:
+                taken.extend((key, amount) for key, amount in zip(keys, amounts) if amount)
+            else:
+                short.append(product_id)
+        if short:
+            self.put_back_taken(taken)
+        return short
+
+    def put_back_taken(self, taken):
+        pipe = self.redis.pipeline()
+        for key, amount in taken:
+            pipe.incrby(key, amount)
+        pipe.execute()
+
+    def give_back(self, quantities: Dict[int, int]):
+        # stock of canceled orders, each product on a random shard
+        self.put_back_taken([
+            (self.shard_key(product_id, random.randrange(settings.FLASH_SALE_SHARDS)), quantity)
+            for product_id, quantity in quantities.items()
+        ])
+
+    def reconcile(self, product_ids: List[int] = None, flash_sale_only: bool = True) -> int:
+        """
+            Copies the redis stock of flash sale products to their rows, all of them in one UPDATE.
+            Returns the number of products written.
+        """
+        if product_ids is None:
+            product_ids = [int(product_id) for product_id in self.redis.smembers(self.products_key)]
+        if not product_ids:
+            return 0
+        pipe = self.redis.pipeline()
+        for product_id in product_ids:
+            pipe.mget(self.shard_keys(product_id))
+        stocks = [sum(int(value or 0) for value in values) for values in pipe.execute()]
+        values = ', '.join(['(%s, %s)'] * len(product_ids))
+        params = [value for pair in zip(product_ids, stocks) for value in pair]
+        sql = (
+            f'UPDATE product_product p SET stock = v.stock FROM (VALUES {values}) AS v(id, stock) '
+            f'WHERE p.id = v.id{" AND p.flash_sale" if flash_sale_only else ""}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+def get_flash_sale_stock() -> FlashSaleStock:
+    return FlashSaleStock()
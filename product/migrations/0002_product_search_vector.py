@@ -0,0 +1,32 @@
+# Generated by Django 4.0.6 on 2026-10-18 10:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_search_vector(apps, schema_editor):
+    from product.models.product import product_search_vector
+    Product = apps.get_model('product', 'Product')
+    Product.objects.update(search_vector=product_search_vector(settings.PRODUCT_SEARCH_CONFIG))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='این فیلد به صورت اتوماتیک از عنوان، زیرعنوان و توضیحات محصول پر میشود.', null=True),
+        ),
+        # filled before the index exists, so the index is built once instead of updated row by row
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.6 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+# price is recomputed whatever the UPDATE sets, so it can never drift from its two components
+PRODUCT_PRICE_SQL = """
+CREATE OR REPLACE FUNCTION product_price() RETURNS trigger AS $$
+BEGIN
+    NEW.price := NEW.base_price + NEW.profit_price;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_price
+BEFORE INSERT OR UPDATE OF base_price, profit_price, price ON product_product
+FOR EACH ROW EXECUTE FUNCTION product_price();
+
+UPDATE product_product SET price = base_price + profit_price;
+"""
+
+DROP_PRODUCT_PRICE_SQL = """
+DROP TRIGGER IF EXISTS product_price ON product_product;
+DROP FUNCTION IF EXISTS product_price();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='price',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='این فیلد به صورت اتوماتیک از جمع قیمت پایه و سود محاسبه میشود.'),
+        ),
+        migrations.RunSQL(PRODUCT_PRICE_SQL, DROP_PRODUCT_PRICE_SQL),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_product_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='موجودی انبار. اگر خالی باشد موجودی این محصول کنترل نمیشود.', null=True),
+        ),
+    ]
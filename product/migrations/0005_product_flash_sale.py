@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_product_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='flash_sale',
+            field=models.BooleanField(default=False, editable=False, help_text='در حراج لحظه ای موجودی این محصول در ردیس نگه داری میشود.'),
+        ),
+    ]
@@ -1,7 +1,39 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField, SearchVector, SearchQuery, SearchRank
 from django.db import models
+from django.db.models import F, FloatField, QuerySet
+from django.db.models.functions import Cast
 from django.urls import reverse
 from django.utils.text import slugify
 
+SEARCH_FIELDS = ('title', 'subtitle', 'description')
+# kept by atomic updates (stock reservations, flash sales), an instance may hold stale values of them
+COUNTER_FIELDS = ('stock', 'flash_sale')
+# computed by update_search_vector() after the save
+COMPUTED_FIELDS = ('search_vector',)
+
+
+def product_search_vector(config: str) -> SearchVector:
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('subtitle', weight='B', config=config)
+        + SearchVector('description', weight='C', config=config)
+    )
+
+
+class ProductManager(models.Manager):
+    def search(self, text: str) -> QuerySet['Product']:
+        """
+            Products whose search_vector matches text (websearch syntax: words, "phrases", -excluded),
+            annotated with their rank. The match is answered by the GIN index.
+        """
+        query = SearchQuery(text, config=settings.PRODUCT_SEARCH_CONFIG, search_type='websearch')
+        # ts_rank returns a real; as double precision it survives the round trip through a keyset cursor exactly
+        # F() so the stored (weighted) vector is ranked, a plain field name would be wrapped in to_tsvector()
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return self.get_queryset().filter(search_vector=query).defer('search_vector').annotate(rank=rank)
+
 
 class Product(models.Model):
     title = models.CharField(
@@ -30,22 +62,107 @@ class Product(models.Model):
     profit_price = models.PositiveBigIntegerField(
         default=0
     )
+    price = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text='این فیلد به صورت اتوماتیک از جمع قیمت پایه و سود محاسبه میشود.'
+    )
+    stock = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='موجودی انبار. اگر خالی باشد موجودی این محصول کنترل نمیشود.'
+    )
+    flash_sale = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text='در حراج لحظه ای موجودی این محصول در ردیس نگه داری میشود.'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text='این فیلد به صورت اتوماتیک از عنوان، زیرعنوان و توضیحات محصول پر میشود.'
+    )
+
+    objects = ProductManager()
 
     class Meta:
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        indexes = [
+            GinIndex(fields=('search_vector',), name='product_search_vector_idx'),
+            models.Index(fields=('price', 'id'), name='product_price_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counters()
+        return instance
+
+    def remember_counters(self):
+        # what a full save compares the counters with, see save()
+        loaded = self.get_deferred_fields()
+        self._loaded_counters = {name: getattr(self, name) for name in COUNTER_FIELDS if name not in loaded}
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title, allow_unicode=True)
+        # a trigger keeps the column right for queryset updates too, this keeps the instance right
+        self.price = int(self.base_price) + int(self.profit_price)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # a full save would write back the stock read before concurrent reservations, see adjust_stock()
+            changed = [
+                name for name, value in getattr(self, '_loaded_counters', {}).items() if getattr(self, name) != value
+            ]
+            if changed:
+                raise ValueError(
+                    f'{", ".join(changed)} of a product is not written by save(), use adjust_stock() or track_stock()'
+                )
+            # and the search_vector it read (if it did), which update_search_vector() writes right after
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS + COMPUTED_FIELDS
+            ]
         super().save(*args, **kwargs)
+        self.remember_counters()
+        if update_fields is None or set(update_fields) & set(SEARCH_FIELDS):
+            self.update_search_vector()
+
+    def adjust_stock(self, change: int) -> bool:
+        """
+            Adds change (negative to take away) to the tracked stock in one UPDATE, so reservations running
+            at the same time are kept. False when the stock is not tracked, is in a flash sale or would go below zero.
+        """
+        updated = Product.objects.filter(id=self.id, stock__gte=max(-change, 0), flash_sale=False).update(
+            stock=F('stock') + change
+        )
+        self.refresh_from_db(fields=('stock',))
+        return bool(updated)
+
+    def track_stock(self, initial: int) -> bool:
+        """
+            Starts tracking the stock of a product whose stock is not tracked yet (NULL), with initial
+            units. False when it is already tracked (change it with adjust_stock()) or initial is negative.
+        """
+        updated = initial >= 0 and Product.objects.filter(id=self.id, stock__isnull=True).update(stock=initial)
+        self.refresh_from_db(fields=('stock',))
+        return bool(updated)
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self.remember_counters()
+
+    def update_search_vector(self):
+        Product.objects.filter(pk=self.pk).update(
+            search_vector=product_search_vector(settings.PRODUCT_SEARCH_CONFIG)
+        )
 
     def get_price(self):
-        return self.base_price + self.profit_price
+        return self.price
 
     def get_absolute_url(self):
-        return reverse('product_detail', args=[self.id, self.slug])
-
+        return reverse('product:api:product_detail', args=[self.slug])
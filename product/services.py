@@ -0,0 +1,25 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from utils.cache import get_version, bump_version
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CACHE_TIMEOUT = settings.CATALOG_CACHE_TIMEOUT
+
+
+def catalog_cache_key(*parts) -> str:
+    """
+        Cached catalog responses are keyed by the current catalog version,
+        so invalidate_catalog() drops all of them at once without deleting anything.
+    """
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'catalog:{get_version(CATALOG_VERSION_KEY)}:{digest}'
+
+
+def invalidate_catalog():
+    bump_version(CATALOG_VERSION_KEY)
+    # again after commit, in case a request cached the old rows before the change was visible
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from product.autocomplete import publish_product_event
+from product.models import Product
+from product.services import invalidate_catalog
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Product)
+def publish_product_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_product_event(instance))
+
+
+@receiver(post_delete, sender=Product)
+def publish_product_deleted(sender, instance, **kwargs):
+    # the id is cleared on the instance after the delete, keep a copy for the event
+    product = Product(id=instance.id, title=instance.title, slug=instance.slug)
+    transaction.on_commit(lambda: publish_product_event(product, deleted=True))
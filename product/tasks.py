@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from product.flash_sale import get_flash_sale_stock
+
+
+@shared_task
+def reconcile_flash_sales():
+    return get_flash_sale_stock().reconcile()
@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from product.autocomplete import ProductAutocomplete, EVENTS_KEY
+from product.models import Product
+from utils.redis_client import get_redis
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15', AUTOCOMPLETE_REFRESH_INTERVAL=0)
+class ProductAutocompleteTest(APITestCase):
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.phone = Product.objects.create(title="گوشی موبایل سامسونگ", base_price=3000000)
+        self.cover = Product.objects.create(title="قاب گوشی", base_price=50000)
+        self.autocomplete = ProductAutocomplete(rebuild_in_background=False)
+
+    def titles(self, prefix):
+        return [result['title'] for result in self.autocomplete.search(prefix)]
+
+    def test_search(self):
+        self.assertEqual(self.titles('گوش'), ["قاب گوشی", "گوشی موبایل سامسونگ"])
+        self.assertEqual(self.titles('سام'), ["گوشی موبایل سامسونگ"])
+        self.assertEqual(self.autocomplete.stats()['items'], 2)
+
+    def test_follows_product_events(self):
+        self.autocomplete.search('گوش')
+        with self.captureOnCommitCallbacks(execute=True):
+            handsfree = Product.objects.create(title="هندزفری سامسونگ", base_price=50000)
+            self.cover.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('سام'), ["گوشی موبایل سامسونگ", "هندزفری سامسونگ"])
+        self.assertEqual(self.titles('قاب'), [])
+        handsfree.title = "هدفون"
+        with self.captureOnCommitCallbacks(execute=True):
+            handsfree.save()
+        self.assertEqual(self.titles('هد'), ["هدفون"])
+        self.assertEqual(self.autocomplete.rebuilds, 1)
+
+    @override_settings(PRODUCT_EVENTS_MAXLEN=1)
+    def test_rebuilds_when_events_were_trimmed(self):
+        self.autocomplete.search('گوش')
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(title="هندزفری", base_price=50000)
+            Product.objects.create(title="هدفون", base_price=50000)
+        get_redis().xtrim(EVENTS_KEY, maxlen=1, approximate=False)
+        self.assertEqual(self.titles('ه'), ["هدفون", "هندزفری"])
+        self.assertEqual(self.autocomplete.rebuilds, 2)
+
+    def test_database_answers_when_the_build_fails(self):
+        with patch('product.autocomplete.PrefixIndex.build', side_effect=RuntimeError('boom')), \
+                self.assertLogs('product.autocomplete', 'ERROR'):
+            self.assertEqual(self.titles('گوش'), ["گوشی موبایل سامسونگ"])
+        self.assertIsNone(self.autocomplete.index)
+        self.assertEqual(self.titles('گوش'), ["قاب گوشی", "گوشی موبایل سامسونگ"])
+
+    def test_rebuilds_in_the_background(self):
+        autocomplete = ProductAutocomplete()
+        with patch.object(autocomplete, 'rebuild') as rebuild, patch('product.autocomplete.threading.Thread') as thread:
+            self.assertEqual([result['title'] for result in autocomplete.search('قاب')], ["قاب گوشی"])
+            autocomplete.search('قاب')
+        rebuild.assert_not_called()
+        thread.assert_called_once_with(target=rebuild, name='product-autocomplete-rebuild', daemon=True)
+
+    @patch('product.api.views.product.product_autocomplete', ProductAutocomplete(rebuild_in_background=False))
+    def test_autocomplete_endpoint(self):
+        url = reverse('product:api:product_autocomplete')
+        response = self.client.get(url, {'q': 'گوشی', 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data.get('results')), 1)
+        response = self.client.get(url, {'q': 'گوشی', 'limit': 'all'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
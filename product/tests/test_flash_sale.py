@@ -0,0 +1,168 @@
+import threading
+from unittest.mock import patch
+
+from django.db import DatabaseError, transaction
+from django.test import override_settings, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.expiry import cancel_orders
+from cart.models import Cart, Order
+from cart.tests.service import create_user
+from product.flash_sale import get_flash_sale_stock
+from product.models import Product
+from product.tasks import reconcile_flash_sales
+from shipping.models import Shipping
+from utils.redis_client import get_redis
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15', FLASH_SALE_SHARDS=4)
+class FlashSaleTest(APITestCase):
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.address = Address.objects.create(user=self.user, province='Tehran', city='tehran', address='somewhere')
+        Shipping.objects.create(type='regular', price=10000)
+        self.phone = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=10)
+        self.handsfree = Product.objects.create(title="هندزفری", base_price=50000, stock=5)
+        self.flash_sale_stock = get_flash_sale_stock()
+        self.flash_sale_stock.start(self.phone)
+        refresh = RefreshToken.for_user(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def finalize(self, quantities, mock_is_between):
+        self.user.get_initial_cart().add_items(quantities)
+        return self.client.post(reverse('cart:api:finalize_cart'), {'address': self.address.id})
+
+    def test_start_splits_stock_over_shards(self):
+        self.phone.refresh_from_db()
+        self.assertTrue(self.phone.flash_sale)
+        self.assertEqual(get_redis().mget(self.flash_sale_stock.shard_keys(self.phone.id)), ['3', '3', '2', '2'])
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 10)
+
+    def test_take_is_all_or_nothing(self):
+        self.assertEqual(self.flash_sale_stock.take({self.phone.id: 4}), [])
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 6)
+        self.assertEqual(self.flash_sale_stock.take({self.phone.id: 5, 999: 1}), [999])
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 6)
+        self.assertEqual(self.flash_sale_stock.take({self.phone.id: 7}), [self.phone.id])
+        self.assertEqual(self.flash_sale_stock.take({self.phone.id: 6}), [])
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 0)
+
+    def test_finalize_takes_flash_sale_stock_from_redis(self):
+        response = self.finalize({self.phone.id: 3, self.handsfree.id: 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 7)
+        self.phone.refresh_from_db()
+        self.handsfree.refresh_from_db()
+        self.assertEqual(self.phone.stock, 10)
+        self.assertEqual(self.handsfree.stock, 4)
+        self.assertEqual(reconcile_flash_sales(), 1)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock, 7)
+
+    def test_short_flash_sale_product_rolls_back_the_cart(self):
+        response = self.finalize({self.phone.id: 11, self.handsfree.id: 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.handsfree.refresh_from_db()
+        self.assertEqual(self.handsfree.stock, 5)
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 10)
+
+    def test_failed_finalize_gives_flash_sale_stock_back(self):
+        # the next initial cart cannot be created, after the stock was taken from redis
+        with patch.object(Cart.objects, 'create', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                self.finalize({self.phone.id: 3, self.handsfree.id: 1})
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 10)
+        self.handsfree.refresh_from_db()
+        self.assertEqual(self.handsfree.stock, 5)
+
+    def test_cancel_gives_stock_back_to_redis(self):
+        self.finalize({self.phone.id: 2, self.handsfree.id: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_orders(Order.objects.all(), 10)
+        self.assertEqual(self.flash_sale_stock.available(self.phone.id), 10)
+        self.handsfree.refresh_from_db()
+        self.assertEqual(self.handsfree.stock, 5)
+
+    def test_end_writes_stock_back(self):
+        self.flash_sale_stock.take({self.phone.id: 4})
+        self.flash_sale_stock.end(self.phone)
+        self.phone.refresh_from_db()
+        self.assertFalse(self.phone.flash_sale)
+        self.assertEqual(self.phone.stock, 6)
+        self.assertEqual(get_redis().exists(*self.flash_sale_stock.shard_keys(self.phone.id)), 0)
+        self.assertEqual(reconcile_flash_sales(), 0)
+
+
+@override_settings(REDIS_URL='redis://localhost:6379/15', FLASH_SALE_SHARDS=4)
+class ParallelFlashSaleTest(TransactionTestCase):
+
+    def test_parallel_takes_never_oversell(self):
+        get_redis().flushdb()
+        product = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=50)
+        get_flash_sale_stock().start(product)
+        sold = []
+
+        def buyer():
+            flash_sale_stock = get_flash_sale_stock()
+            for _ in range(10):
+                if not flash_sale_stock.take({product.id: 2}):
+                    sold.append(2)
+
+        threads = [threading.Thread(target=buyer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(sold), 50)
+        self.assertEqual(get_flash_sale_stock().available(product.id), 0)
+
+    def test_last_units_spread_over_shards_are_sold(self):
+        get_redis().flushdb()
+        product = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=4)
+        get_flash_sale_stock().start(product)
+        for _ in range(30):
+            # one unit on each shard, two buyers of 3: one of them gets them, not none
+            get_redis().mset({key: 1 for key in get_flash_sale_stock().shard_keys(product.id)})
+            start, short = threading.Barrier(2), []
+
+            def buyer():
+                flash_sale_stock = get_flash_sale_stock()
+                start.wait()
+                short.extend(flash_sale_stock.take({product.id: 3}))
+
+            threads = [threading.Thread(target=buyer) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(short, [product.id])
+            self.assertEqual(get_flash_sale_stock().available(product.id), 1)
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def test_end_waits_for_carts_taking_stock(self, mock_is_between):
+        get_redis().flushdb()
+        Shipping.objects.create(type='regular', price=10000)
+        product = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=10)
+        get_flash_sale_stock().start(product)
+        user = create_user('mahsa', 'mah61700250185')
+        address = Address.objects.create(user=user, province='Tehran', city='tehran', address='somewhere')
+        cart = user.get_initial_cart()
+        cart.add_items({product.id: 3})
+        ended = threading.Thread(target=lambda: get_flash_sale_stock().end(product))
+        with transaction.atomic():
+            cart.finalize(address, None)
+            ended.start()
+            ended.join(0.3)
+            # the shards are not summed while the cart that took 3 of them is still open
+            self.assertTrue(ended.is_alive())
+        ended.join()
+        product.refresh_from_db()
+        self.assertFalse(product.flash_sale)
+        self.assertEqual(product.stock, 7)
@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from cart.tests.service import create_user
+from product.models import Product
+
+
+class ProductCatalogTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.product1 = Product.objects.create(
+            title="گوشی موبایل",
+            description="توضیحات ندارد",
+            is_fragile=True,
+            base_price=3000000,
+            profit_price=500000
+        )
+        self.product2 = Product.objects.create(
+            title="هندزفری",
+            description="توضیحات ندارد",
+            is_fragile=False,
+            base_price=50000,
+            profit_price=5000
+        )
+
+    def test_product_list(self):
+        response = self.client.get(reverse('product:api:product_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('count'), 2)
+        self.assertEqual(response.data.get('results')[0].get('price'), 3500000)
+        self.assertNotIn('description', response.data.get('results')[0])
+
+    def test_product_detail_by_slug(self):
+        response = self.client.get(self.product1.get_absolute_url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('id'), self.product1.id)
+        self.assertEqual(response.data.get('description'), "توضیحات ندارد")
+        response = self.client.get(reverse('product:api:product_detail', args=['not-a-product']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_fields_projection(self):
+        response = self.client.get(reverse('product:api:product_list'), {'fields': 'id,price'})
+        self.assertEqual(list(response.data.get('results')[0].keys()), ['id', 'price'])
+        response = self.client.get(self.product1.get_absolute_url(), {'fields': 'title'})
+        self.assertEqual(response.data, {'title': "گوشی موبایل"})
+
+    def test_cached_response_runs_no_queries(self):
+        url = reverse('product:api:product_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data.get('count'), 2)
+
+    def test_conditional_requests(self):
+        url = self.product1.get_absolute_url()
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_save_invalidates_cache(self):
+        url = self.product1.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        self.product1.profit_price = 600000
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('price'), 3600000)
+        self.assertNotEqual(response['ETag'], etag)
+        self.product2.delete()
+        self.assertEqual(self.client.get(reverse('product:api:product_list')).data.get('count'), 1)
+
+    def test_price_column(self):
+        self.assertEqual(self.product1.price, 3500000)
+        Product.objects.filter(id=self.product1.id).update(base_price=4000000)
+        self.product1.refresh_from_db()
+        self.assertEqual(self.product1.price, 4500000)
+        Product.objects.filter(id=self.product1.id).update(price=1)
+        self.product1.refresh_from_db()
+        self.assertEqual(self.product1.get_price(), 4500000)
+
+    def test_cart_follows_price_column(self):
+        cart = create_user('mahsa', 'mah61700250185').get_initial_cart()
+        cart.add_item(self.product2, 2)
+        Product.objects.filter(id=self.product2.id).update(profit_price=10000)
+        cart.refresh_from_db()
+        self.assertEqual(cart.subtotal, 2 * 60000)
+        self.assertEqual(cart.get_cart_price(), 2 * 60000)
+
+    def test_order_and_filter_by_price(self):
+        url = reverse('product:api:product_list')
+        response = self.client.get(url, {'ordering': 'price'})
+        self.assertEqual([product['id'] for product in response.data.get('results')], [self.product2.id, self.product1.id])
+        response = self.client.get(url, {'ordering': '-price', 'price__lte': 1000000})
+        self.assertEqual([product['id'] for product in response.data.get('results')], [self.product2.id])
+
+    def test_price_ordering_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE product_product')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Product.objects.filter(price__gte=100000).order_by('price', 'id')[:10].explain()
+        self.assertIn('product_price_idx', plan, plan)
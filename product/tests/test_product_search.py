@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from product.api.pagination import ProductSearchPagination
+from product.models import Product
+
+
+class ProductSearchTest(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.phone = Product.objects.create(
+            title="گوشی موبایل سامسونگ",
+            subtitle="Galaxy A52",
+            description="گوشی هوشمند با دوربین خوب",
+            base_price=3000000,
+        )
+        self.cover = Product.objects.create(
+            title="قاب",
+            description="مناسب برای گوشی سامسونگ",
+            base_price=50000,
+        )
+        self.handsfree = Product.objects.create(
+            title="هندزفری",
+            description="توضیحات ندارد",
+            base_price=50000,
+        )
+        self.url = reverse('product:api:product_search')
+
+    def test_search_is_ranked(self):
+        response = self.client.get(self.url, {'q': 'گوشی سامسونگ'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [product['id'] for product in response.data.get('results')]
+        self.assertEqual(ids, [self.phone.id, self.cover.id])
+
+    def test_search_syntax(self):
+        self.assertEqual(Product.objects.search('galaxy').get(), self.phone)
+        self.assertEqual(Product.objects.search('گوشی -قاب').get(), self.phone)
+        self.assertEqual(Product.objects.search('"گوشی هوشمند"').get(), self.phone)
+
+    def test_search_requires_text(self):
+        response = self.client.get(self.url, {'q': ' '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_vector_follows_save(self):
+        self.handsfree.description = "هندزفری بلوتوث سامسونگ"
+        self.handsfree.save()
+        self.assertIn(self.handsfree, Product.objects.search('بلوتوث'))
+        self.handsfree.base_price = 60000
+        with self.assertNumQueries(1):
+            self.handsfree.save(update_fields=['base_price'])
+
+    def test_full_save_leaves_the_vector_to_its_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.handsfree.save()
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('search_vector', queries[0]['sql'])
+        self.assertIn(self.handsfree, Product.objects.search('هندزفری'))
+
+    def test_vector_is_not_read(self):
+        urls = [self.url + '?q=گوشی', reverse('product:api:product_list'),
+                reverse('product:api:product_detail', args=[self.phone.slug])]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            selects = [query['sql'].split(' FROM ')[0] for query in queries]
+            self.assertTrue(selects)
+            # ranked by it, but not read
+            self.assertFalse([select for select in selects if ', "product_product"."search_vector"' in select], url)
+
+    def test_invalid_cursor(self):
+        for position in (['best', 1], [0.5, 'one']):
+            cursor = ProductSearchPagination.encode_cursor(position)
+            response = self.client.get(self.url, {'q': 'گوشی', 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_keyset_pages(self):
+        for index in range(45):
+            Product.objects.create(title=f"کابل شارژ {index}", base_price=10000)
+        seen, params = [], {'q': 'کابل', 'count': 'true'}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.data.get('count'), 45)
+        while True:
+            seen.extend(product['id'] for product in response.data.get('results'))
+            if not response.data.get('next'):
+                break
+            response = self.client.get(response.data.get('next'))
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(len(set(seen)), 45)
+
+    def test_search_uses_gin_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE product_product')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Product.objects.search('سامسونگ').explain()
+        self.assertIn('product_search_vector_idx', plan, plan)
@@ -0,0 +1,46 @@
+import threading
+from typing import Union
+
+from django.db import transaction
+
+from shipping.models import Shipping
+from utils.cache import get_version, bump_version
+
+
+class ShippingRegistry:
+    """
+        Shipping rates kept in memory for the whole process.
+        Saving or deleting a Shipping bumps a version key in the shared cache,
+        which makes every worker reload the (tiny) table on its next lookup.
+    """
+    version_key = 'shipping:version'
+
+    def __init__(self):
+        self._rates = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, type_: str) -> Union[Shipping, None]:
+        version = get_version(self.version_key)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._rates = self.load()
+                    self._version = version
+        return self._rates.get(type_)
+
+    @staticmethod
+    def load() -> dict:
+        rates = {}
+        # the lowest id wins, like Shipping.objects.filter(type=...).first()
+        for shipping in Shipping.objects.order_by('-id'):
+            rates[shipping.type] = shipping
+        return rates
+
+    def invalidate(self):
+        bump_version(self.version_key)
+        # again after commit, in case a worker reloaded before the change was visible
+        transaction.on_commit(lambda: bump_version(self.version_key))
+
+
+shipping_registry = ShippingRegistry()
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from shipping.models import Shipping
+from shipping.services import shipping_registry
+
+
+@receiver(post_save, sender=Shipping)
+@receiver(post_delete, sender=Shipping)
+def invalidate_shipping_registry(sender, instance, **kwargs):
+    shipping_registry.invalidate()
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from shipping.models import Shipping
+from shipping.services import ShippingRegistry
+
+
+class ShippingRegistryTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Shipping.objects.all().delete()
+        self.regular = Shipping.objects.create(type='regular', price=10000)
+        self.express = Shipping.objects.create(type='express', price=20000)
+        self.registry = ShippingRegistry()
+
+    def test_get_shipping_without_query_after_first_load(self):
+        self.assertEqual(self.registry.get('regular'), self.regular)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get('express').price, 20000)
+            self.assertEqual(self.registry.get('regular').price, 10000)
+
+    def test_reload_after_shipping_saved(self):
+        self.registry.get('regular')
+        self.regular.price = 15000
+        self.regular.save()
+        self.assertEqual(self.registry.get('regular').price, 15000)
+
+    def test_reload_after_shipping_deleted(self):
+        self.registry.get('express')
+        self.express.delete()
+        self.assertIsNone(self.registry.get('express'))
+
+    def test_reload_when_version_is_lost(self):
+        self.registry.get('regular')
+        Shipping.objects.filter(id=self.regular.id).update(price=12000)
+        cache.clear()
+        self.assertEqual(self.registry.get('regular').price, 12000)
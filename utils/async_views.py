@@ -0,0 +1,63 @@
+from functools import wraps
+
+from django.http import Http404, HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+
+from utils.authentication import ais_user_active, check_user_active
+from utils.http import json_response
+
+authentication = JWTTokenUserAuthentication()
+
+
+def authenticate(request):
+    # the user comes from the token claims, no SQL
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated()
+    return authentication.get_user(authentication.get_validated_token(raw_token))
+
+
+async def aauthenticate(request):
+    # authenticate(), and like ActiveTokenUserAuthentication a deactivated user is refused
+    user = authenticate(request)
+    check_user_active(await ais_user_active(user.id))
+    return user
+
+
+def request_data(request) -> dict:
+    return Request(request, parsers=[JSONParser(), FormParser(), MultiPartParser()]).data
+
+
+def async_api_view(*methods):
+    """
+        Turns an async function into an API view: checks the method, sets request.user from the JWT
+        and renders APIExceptions the way DRF does. DRF views cannot be async yet, and django 4.0
+        decorators such as csrf_exempt would hide the coroutine from the handler, so this does it all.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                request.user = await aauthenticate(request)
+                return await view(request, *args, **kwargs)
+            except Http404:
+                exception = NotFound()
+                return json_response({'detail': exception.detail}, exception.status_code)
+            except APIException as exception:
+                detail = exception.detail if isinstance(exception.detail, (list, dict)) else {'detail': exception.detail}
+                response = json_response(detail, exception.status_code)
+                if exception.status_code == status.HTTP_401_UNAUTHORIZED:
+                    response['WWW-Authenticate'] = authentication.authenticate_header(request)
+                return response
+
+        wrapped.csrf_exempt = True
+        return wrapped
+
+    return decorator
@@ -0,0 +1,54 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+
+from utils.cache import aget_many
+
+
+def user_active_key(user_id) -> str:
+    return f'user:{user_id}:active'
+
+
+def is_user_active(user_id) -> bool:
+    key = user_active_key(user_id)
+    active = cache.get(key)
+    if active is None:
+        # a deleted user is not active either
+        active = get_user_model().objects.filter(id=user_id, is_active=True).exists()
+        cache.set(key, active, settings.USER_ACTIVE_CACHE_TIMEOUT)
+    return active
+
+
+async def ais_user_active(user_id) -> bool:
+    active = (await aget_many([user_active_key(user_id)])).get(user_active_key(user_id))
+    if active is None:
+        active = await sync_to_async(is_user_active)(user_id)
+    return active
+
+
+def forget_user_active(user_id):
+    cache.delete(user_active_key(user_id))
+    # again after commit, in case a request cached the old row before the change was visible
+    transaction.on_commit(lambda: cache.delete(user_active_key(user_id)))
+
+
+def check_user_active(active: bool):
+    if not active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+
+class ActiveTokenUserAuthentication(JWTTokenUserAuthentication):
+    """
+        JWTTokenUserAuthentication, the user is taken from the token claims instead of the database,
+        but a deactivated or deleted user is refused, as JWTAuthentication does. Whether a user is
+        active is cached, and dropped whenever the user is saved or deleted.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        check_user_active(is_user_active(user.id))
+        return user
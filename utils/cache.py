@@ -0,0 +1,71 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+
+from utils.redis_client import get_async_redis
+
+_serializer = RedisSerializer()
+
+
+def get_version(key: str) -> str:
+    """
+        Current token of a version key. A random token (instead of a counter) means an evicted
+        or flushed key can never come back with a value some worker has already seen.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key: str) -> str:
+    version = uuid.uuid4().hex
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def _async_cache_client():
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not isinstance(backend, RedisCache):
+        return backend, None
+    return backend, get_async_redis(backend._servers[0], decode_responses=False)
+
+
+async def aget_many(keys: list) -> dict:
+    """
+        cache.get_many() over redis.asyncio, with the keys and serialization of django's RedisCache,
+        so the values are shared with the sync code. The built in aget_many of django 4.0
+        runs one get per key in a thread. Other backends fall back to it.
+    """
+    backend, client = _async_cache_client()
+    if client is None:
+        return await backend.aget_many(keys)
+    values = await client.mget([backend.make_key(key) for key in keys])
+    return {key: _serializer.loads(value) for key, value in zip(keys, values) if value is not None}
+
+
+async def aset(key: str, value, timeout):
+    backend, client = _async_cache_client()
+    if client is None:
+        return await backend.aset(key, value, timeout)
+    timeout = backend.get_backend_timeout(timeout)
+    if timeout == 0:
+        await client.delete(backend.make_key(key))
+    else:
+        await client.set(backend.make_key(key), _serializer.dumps(value), ex=timeout)
+
+
+async def aget_version(key: str) -> str:
+    version = (await aget_many([key])).get(key)
+    if version is None:
+        version = await sync_to_async(get_version)(key)
+    return version
+
+
+async def abump_version(key: str) -> str:
+    version = uuid.uuid4().hex
+    await aset(key, version, None)
+    return version
@@ -0,0 +1,146 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.urls import reverse
+from rest_framework.exceptions import APIException
+
+from utils.async_views import authenticate
+from utils.cache import aget_many, aset
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# only set by ReplicaReadMiddleware, so celery tasks, commands and the shell always use the primary
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def read_from_primary():
+    # for reads that are cached past the replica lag, e.g. under a version that was just bumped
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def pin_key(user_id) -> str:
+    return f'db:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    # the replicas may not have this user's writes yet, read them from the primary for a while
+    cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id) -> bool:
+    return bool(cache.get(pin_key(user_id)))
+
+
+class PrimaryReplicaRouter:
+    """
+        Sends the reads of REPLICA_READ_MODELS (order history, products, profiles) to a random replica,
+        when the request allows it and the primary is not in a transaction. Everything else, carts included,
+        uses the primary. Related objects are read from the database their instance came from.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get() or model._meta.label_lower not in settings.REPLICA_READ_MODELS:
+            return None
+        if not settings.REPLICA_DATABASES:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMiddleware:
+    """
+        Lets the safe requests of users who have not written lately read from the replicas.
+        A successful unsafe request pins its user to the primary for REPLICA_PIN_SECONDS, so they
+        always see their own writes (e.g. the order they just finalized). The user is taken from the
+        JWT here, DRF only authenticates inside the view. The admin, and anything else on a session,
+        always reads the primary: it saves what it reads, and a stale replica row would be written back.
+        Does nothing when no replica is configured.
+        Not a MiddlewareMixin: under ASGI it runs its hooks in copies of the context, and the flag
+        set by one of them would neither reach the view nor be reset.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # lets django call this middleware without a thread hop, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.routed(request):
+            return self.get_response(request)
+        user_id = self.get_user_id(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            user_id = self.get_writer_id(request, response, user_id)
+            if user_id is not None:
+                pin_to_primary(user_id)
+            return response
+        token = _read_from_replica.set(user_id is None or not is_pinned(user_id))
+        try:
+            return self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+    async def __acall__(self, request):
+        if not self.routed(request):
+            return await self.get_response(request)
+        user_id = self.get_user_id(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            user_id = self.get_writer_id(request, response, user_id)
+            if user_id is not None:
+                await aset(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+            return response
+        pinned = user_id is not None and (await aget_many([pin_key(user_id)])).get(pin_key(user_id))
+        token = _read_from_replica.set(not pinned)
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+    @staticmethod
+    def routed(request) -> bool:
+        if not settings.REPLICA_DATABASES or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        return not request.path.startswith(reverse('admin:index'))
+
+    @staticmethod
+    def get_user_id(request):
+        try:
+            return authenticate(request).id
+        except APIException:
+            return None
+
+    @staticmethod
+    def get_writer_id(request, response, user_id):
+        if response.status_code >= 400:
+            return None
+        user = getattr(request, 'user', None)  # set by the DRF view, e.g. on login
+        if user is not None and user.is_authenticated:
+            return user.id
+        return user_id
@@ -1,11 +1,46 @@
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from typing import Union
 
-from khayyam import JalaliDatetime
+from khayyam import JalaliDate
 from pytz import timezone
 
 
+class JalaliFormatter:
+    """
+        Formats datetimes the way str(JalaliDatetime(...)) does, i.e.
+        'YYYY-MM-DD HH:MM:SS.ffffff+HH:MM' in the Jalali calendar,
+        with the timezone built once and the calendar conversion memoized per day.
+    """
+
+    def __init__(self, tz_name: str = 'Asia/Tehran'):
+        self.tz = timezone(tz_name)
+        self._jalali_date = lru_cache(maxsize=4096)(self._convert_date)
+        self._utc_offset = lru_cache(maxsize=32)(self._convert_offset)
+
+    @staticmethod
+    def _convert_date(gregorian_date: date) -> str:
+        return JalaliDate(gregorian_date).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _convert_offset(offset: Union[timedelta, None]) -> str:
+        if offset is None:
+            return ''
+        sign = '-' if offset < timedelta(0) else '+'
+        minutes = abs(offset) // timedelta(minutes=1)
+        return f'{sign}{minutes // 60:02d}:{minutes % 60:02d}'
+
+    def format(self, value: datetime) -> str:
+        local = value.astimezone(tz=self.tz)
+        return (
+            f'{self._jalali_date(local.date())} '
+            f'{local.hour:02d}:{local.minute:02d}:{local.second:02d}.{local.microsecond:06d}'
+            f'{self._utc_offset(local.utcoffset())}'
+        )
+
+
+jalali_formatter = JalaliFormatter()
+
+
 def PersianDateTime(date: datetime) -> str:
-    ir_date = JalaliDatetime(
-        date.astimezone(tz=timezone('Asia/Tehran'))
-    )
-    return str(ir_date)
+    return jalali_formatter.format(date)
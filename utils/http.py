@@ -0,0 +1,71 @@
+import hashlib
+import json
+import time
+from typing import Callable
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def make_etag(data) -> str:
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    return 'W/' + quote_etag(hashlib.md5(payload).hexdigest())
+
+
+def version_etag(*parts) -> str:
+    # strong, as the parts identify the exact content of the representation
+    payload = json.dumps(parts, cls=DjangoJSONEncoder).encode()
+    return quote_etag(hashlib.sha1(payload).hexdigest())
+
+
+def set_validators(response, etag: str, last_modified: int = None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_conditional_response(request, cache_key: str, build: Callable, timeout: int):
+    """
+        Returns the response data cached under cache_key, building (and caching) it with
+        build() on a miss. The ETag and Last-Modified are stored with the data, so a
+        matching If-None-Match / If-Modified-Since gets a 304 without calling build().
+    """
+    entry = cache.get(cache_key)
+    if entry is None:
+        data = build()
+        entry = {'data': data, 'etag': make_etag(data), 'last_modified': int(time.time())}
+        cache.set(cache_key, entry, timeout)
+    not_modified = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+    if not_modified is not None:
+        return set_validators(not_modified, entry['etag'], entry['last_modified'])
+    return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+
+
+def conditional_response(request, etag: str, build: Callable):
+    """
+        Answers a matching If-None-Match with a 304 before build() is called,
+        so the body is only serialized when the client does not have it yet.
+    """
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return set_validators(not_modified, etag)
+    return set_validators(Response(build()), etag)
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    # the bytes a DRF view would send, for views that are not DRF views
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def aconditional_response(request, etag: str, build: Callable):
+    # conditional_response() for async views, build() is awaited
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return set_validators(not_modified, etag)
+    return set_validators(json_response(await build()), etag)
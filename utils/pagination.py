@@ -0,0 +1,106 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+        Pages by the position of the last row instead of an OFFSET, so page N costs
+        the same as page 1. ordering must be two fields, the second one unique (e.g. id).
+        The total count is only computed when the client asks for it with ?count=true.
+    """
+    ordering = None  # set by subclasses, e.g. ('-created', '-id')
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = queryset.count() if self.count_requested(request) else None
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = self.filter_after(queryset, position)
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def filter_after(self, queryset, position):
+        (first, second), (first_value, second_value) = self.fields, position
+        first_descending, second_descending = (field.startswith('-') for field in self.ordering)
+        # (first, second) < (first_value, second_value), written so the index range on first is used
+        queryset = queryset.filter(**{f'{first}__{"lte" if first_descending else "gte"}': first_value})
+        return queryset.exclude(**{first: first_value, f'{second}__{"gte" if second_descending else "lte"}': second_value})
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_position(self, instance) -> list:
+        position = []
+        for field in self.fields:
+            value = getattr(instance, field)
+            position.append(value.isoformat() if isinstance(value, datetime) else value)
+        return position
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # the cursor comes from the client, every value is checked against the field it is compared with
+        try:
+            position = [self.get_field(queryset, field).to_python(value) for field, value in zip(self.fields, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def get_field(queryset, name):
+        # a model field, or the output field of an annotation such as the search rank
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def encode_cursor(position) -> str:
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def count_requested(self, request) -> bool:
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['first'] = self.get_first_link()
+        response['results'] = data
+        return Response(response)
@@ -0,0 +1,72 @@
+import threading
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+
+from utils.pooled_postgresql.creation import DatabaseCreation
+from utils.pooled_postgresql.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(wrapper: 'DatabaseWrapper') -> ConnectionPool:
+    # one pool per database of an alias; the test runner points the alias to another database
+    settings_dict = wrapper.settings_dict
+    key = (wrapper.alias, settings_dict['HOST'], settings_dict['PORT'], settings_dict['NAME'], settings_dict['USER'])
+    with _pools_lock:
+        if key not in _pools:
+            options = settings_dict.get('POOL', {})
+            _pools[key] = ConnectionPool(
+                max_size=options.get('MAX_SIZE', 20),
+                timeout=options.get('TIMEOUT', 5),
+                check_idle_after=options.get('CHECK_IDLE_AFTER', 30),
+                max_lifetime=options.get('MAX_LIFETIME', 3600),
+            )
+        return _pools[key]
+
+
+def close_pools(database_name: str = None):
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items() if database_name in (None, key[3])]
+    for pool in pools:
+        pool.close_all()
+
+
+def pool_stats() -> dict:
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {f'{alias}:{name}': pool.stats() for (alias, host, port, name, user), pool in pools}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+        The postgresql backend, with its connections taken from and given back to a process wide
+        ConnectionPool instead of opened and closed. With CONN_MAX_AGE = 0 django gives the
+        connection back at the end of every request. Sized and tuned by the POOL entry of the
+        database settings (MAX_SIZE, TIMEOUT, CHECK_IDLE_AFTER, MAX_LIFETIME).
+    """
+    creation_class = DatabaseCreation
+
+    @property
+    def pooled(self) -> bool:
+        # the short lived connections to the 'postgres' database, e.g. to create the test database
+        return self.alias != NO_DB_ALIAS
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        connection = get_pool(self).getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # set by get_new_connection(), which only runs for the connections the pool opens
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if not self.pooled:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # close() keeps self.connection until the atomic block exits, so it must not
+                # go to another thread: closed, the pool drops it and opens a new one when needed
+                self.connection.close()
+            get_pool(self).putconn(self.connection)
@@ -0,0 +1,9 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # the idle pooled connections would keep postgres from dropping the database
+        from utils.pooled_postgresql.base import close_pools
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
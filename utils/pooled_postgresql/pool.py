@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    # a psycopg2 error, so django wraps it into django.db.OperationalError like any other connect failure
+    pass
+
+
+class ConnectionPool:
+    """
+        A bounded pool of psycopg2 connections shared by the threads (or greenlets) of one process.
+        getconn() hands out an idle connection, opens a new one while fewer than max_size are open,
+        or waits up to timeout seconds for one to come back. Connections that sat idle longer than
+        check_idle_after seconds are checked with a SELECT 1 before they are handed out.
+        A forked child (celery prefork) starts with an empty pool, see _check_pid().
+    """
+
+    def __init__(self, max_size: int = 20, timeout: float = 5, check_idle_after: float = 30,
+                 max_lifetime: float = 3600):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle_after = check_idle_after
+        self.max_lifetime = max_lifetime
+        self._abandoned = []
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = deque()  # (connection, returned at)
+        self._opened_at = {}  # id(connection) -> opened at
+        self._size = 0
+        self._waiting = 0
+        self._stats = dict.fromkeys(
+            ('checkouts', 'waits', 'timeouts', 'opened', 'discarded', 'health_check_failures'), 0
+        )
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _check_pid(self):
+        # the connections of the parent share its sockets: closing them here (or letting them be
+        # garbage collected) would end its sessions, so they are kept referenced and never used
+        if self.pid != os.getpid():
+            self._abandoned.extend(connection for connection, _ in self._idle)
+            self._reset()
+
+    def getconn(self, connect: Callable):
+        # connect() opens a new connection, it is only called while fewer than max_size are open
+        self._check_pid()
+        deadline = time.monotonic() + self.timeout
+        waited_since = None
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f'no database connection available within {self.timeout} seconds')
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        self._stats['waits'] += 1
+                    self._waiting += 1
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if waited_since is not None:
+                    wait_time = time.monotonic() - waited_since
+                    self._wait_time_total += wait_time
+                    self._wait_time_max = max(self._wait_time_max, wait_time)
+                    waited_since = None
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                else:
+                    connection, returned_at = None, None
+                    self._size += 1
+            # the round trips happen outside of the lock
+            if connection is None:
+                return self._open(connect)
+            if self._healthy(connection, returned_at):
+                with self._condition:
+                    self._stats['checkouts'] += 1
+                return connection
+            self._discard(connection)
+            with self._condition:
+                self._stats['health_check_failures'] += 1
+
+    def _open(self, connect: Callable):
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[id(connection)] = time.monotonic()
+            self._stats['opened'] += 1
+            self._stats['checkouts'] += 1
+        return connection
+
+    def _healthy(self, connection, returned_at: float) -> bool:
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    def putconn(self, connection):
+        self._check_pid()
+        if id(connection) not in self._opened_at:
+            # checked out before a fork
+            self._abandoned.append(connection)
+            return
+        if not self._reusable(connection):
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def _reusable(self, connection) -> bool:
+        if connection.closed:
+            return False
+        if time.monotonic() - self._opened_at[id(connection)] > self.max_lifetime:
+            return False
+        status = connection.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+            # closed in the middle of a transaction, e.g. by a failed request
+            try:
+                connection.rollback()
+                return True
+            except psycopg2.Error:
+                return False
+        return False  # a query still running, or the server is gone
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self._condition:
+            self._opened_at.pop(id(connection), None)
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._condition.notify()
+
+    def close_all(self):
+        # closes the idle connections, the ones in use still go back to the pool
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                **self._stats,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 3),
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 3),
+            }
@@ -0,0 +1,13 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from utils.pooled_postgresql.base import pool_stats
+
+
+class DatabasePoolStatsAPIView(APIView):
+    # the pools of the process that serves the request, poll it a few times to see every worker
+    permission_classes = (IsAdminUser,)
+
+    def get(self, *args, **kwargs):
+        return Response(pool_stats())
@@ -0,0 +1,114 @@
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+# arabic letters typed on some keyboards, and the zero width non-joiner
+REPLACEMENTS = (('ي', 'ی'), ('ك', 'ک'), ('ة', 'ه'), ('\u200c', ' '))
+
+
+def normalize(text: str) -> str:
+    # chained replace() is several times faster than str.translate() with a dict
+    for old, new in REPLACEMENTS:
+        if old in text:
+            text = text.replace(old, new)
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """
+        Sorted array of (key, id) pairs answering "ids whose key starts with prefix" with a binary search.
+        Keys are kept in one list and ids in a parallel array('q'), which is much more compact
+        than a trie of dicts. Every word start of a text is a key, so a prefix of any word matches.
+        Results come in key order, shorter and alphabetically earlier keys first.
+        Keys are cut to key_length characters; the rare longer prefix is checked against the texts.
+    """
+
+    def __init__(self, key_length: int = 24):
+        self.key_length = key_length
+        self.keys: List[str] = []
+        self.ids = array('q')
+        self.texts: Dict[int, Tuple[str, ...]] = {}
+        self.build_seconds = 0.0
+
+    def make_keys(self, texts: Iterable[str], key_length: int = None) -> List[str]:
+        key_length = key_length or self.key_length
+        keys = set()
+        for text in texts:
+            text = normalize(text or '')
+            start = 0
+            while text:
+                keys.add(text[start:start + key_length])
+                start = text.find(' ', start) + 1
+                if not start:
+                    break
+        return sorted(keys)
+
+    def build(self, rows: Iterable[Tuple[int, Tuple[str, ...]]]):
+        started = time.perf_counter()
+        texts, pairs = {}, []
+        for id_, row_texts in rows:
+            texts[id_] = row_texts
+            pairs.extend((key, id_) for key in self.make_keys(row_texts))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.ids = array('q', (id_ for _, id_ in pairs))
+        self.texts = texts
+        self.build_seconds = time.perf_counter() - started
+
+    def add(self, id_: int, texts: Tuple[str, ...]):
+        self.remove(id_)
+        self.texts[id_] = texts
+        for key in self.make_keys(texts):
+            position = bisect_left(self.keys, key)
+            # equal keys are ordered by id, like after a full build
+            while position < len(self.keys) and self.keys[position] == key and self.ids[position] < id_:
+                position += 1
+            self.keys.insert(position, key)
+            self.ids.insert(position, id_)
+
+    def remove(self, id_: int):
+        texts = self.texts.pop(id_, None)
+        if texts is None:
+            return
+        for key in self.make_keys(texts):
+            position = bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key:
+                if self.ids[position] == id_:
+                    del self.keys[position]
+                    del self.ids[position]
+                    break
+                position += 1
+
+    def search(self, prefix: str, limit: int) -> List[int]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        key_prefix = prefix[:self.key_length]
+        position = bisect_left(self.keys, key_prefix)
+        while position < len(self.keys) and len(found) < limit and self.keys[position].startswith(key_prefix):
+            id_ = self.ids[position]
+            if id_ not in found and (prefix == key_prefix or self.matches(id_, prefix)):
+                found.append(id_)
+            position += 1
+        return found
+
+    def matches(self, id_: int, prefix: str) -> bool:
+        return any(key.startswith(prefix) for key in self.make_keys(self.texts[id_], len(prefix)))
+
+    def memory_bytes(self) -> int:
+        """ Approximate size of the index: the key strings, both arrays and the texts kept for results. """
+        size = sys.getsizeof(self.keys) + sys.getsizeof(self.ids) + sys.getsizeof(self.texts)
+        size += sum(sys.getsizeof(key) for key in self.keys)
+        size += sum(sys.getsizeof(texts) + sum(sys.getsizeof(text) for text in texts) for texts in self.texts.values())
+        return size
+
+    def stats(self) -> dict:
+        return {
+            'items': len(self.texts),
+            'keys': len(self.keys),
+            'memory_bytes': self.memory_bytes(),
+            'build_seconds': round(self.build_seconds, 6),
+        }
@@ -0,0 +1,27 @@
+import asyncio
+import weakref
+from functools import lru_cache
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=None)
+def _connect(url: str) -> redis.Redis:
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def get_redis() -> redis.Redis:
+    return _connect(settings.REDIS_URL)
+
+
+def get_async_redis(url: str = None, decode_responses: bool = True) -> redis.asyncio.Redis:
+    # one client per event loop, the connections of a client cannot be used from another loop
+    url = url or settings.REDIS_URL
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if (url, decode_responses) not in clients:
+        clients[url, decode_responses] = redis.asyncio.Redis.from_url(url, decode_responses=decode_responses)
+    return clients[url, decode_responses]
@@ -0,0 +1,138 @@
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Address
+from cart.models import Cart, Order
+from cart.tests.service import create_user
+from product.models import Product
+from shipping.models import Shipping
+from utils.db_router import PrimaryReplicaRouter, _read_from_replica, is_pinned, read_from_primary
+
+
+@override_settings(REPLICA_DATABASES=('replica',))
+class ReplicaRoutingTest(TransactionTestCase):
+    """ A second connection to the test database plays the replica: it only sees committed rows, like a real one. """
+
+    @classmethod
+    def setUpClass(cls):
+        if 'replica' not in connections.settings:
+            # no replica is configured, the alias only exists for these tests
+            connections.settings['replica'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+            cls.addClassCleanup(cls.remove_replica)
+        # set here, the test runner checks the databases of the test classes before they are set up
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @staticmethod
+    def remove_replica():
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('mahsa', 'mah61700250185')
+        self.token = f'Bearer {RefreshToken.for_user(user=self.user).access_token}'
+        self.product = Product.objects.create(title="گوشی موبایل", base_price=3000000, stock=5)
+        Order.objects.create(user=self.user, step=Cart.StepChoices.PENDING, items_total=10000,
+                             total_after_discount=10000, grand_total=10000)
+
+    def replica_queries(self, method, name, data=None):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = getattr(self.client, method)(reverse(name), data, HTTP_AUTHORIZATION=self.token)
+        self.assertLess(response.status_code, 400)
+        return len(queries)
+
+    def test_router(self):
+        router = PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(Order))
+        token = _read_from_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Order), 'replica')
+            self.assertIsNone(router.db_for_read(Cart))
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Order), 'default')
+            with override_settings(REPLICA_DATABASES=()):
+                self.assertIsNone(router.db_for_read(Order))
+        finally:
+            _read_from_replica.reset(token)
+        self.assertEqual(router.db_for_write(Order), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'cart'))
+
+    def test_order_history_is_read_from_the_replica(self):
+        self.assertGreater(self.replica_queries('get', 'cart:api:order_list'), 0)
+        # the cart is read from the primary
+        self.assertEqual(self.replica_queries('get', 'cart:api:cart'), 0)
+
+    def test_cached_catalog_is_built_from_the_primary(self):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(reverse('product:api:product_list'))
+            self.client.get(reverse('product:api:product_detail', args=[self.product.slug]))
+        self.assertEqual(len(queries), 0)
+        # but other product reads of the request still go to the replica
+        token = _read_from_replica.set(True)
+        try:
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(Product), 'replica')
+            with read_from_primary():
+                self.assertIsNone(PrimaryReplicaRouter().db_for_read(Product))
+        finally:
+            _read_from_replica.reset(token)
+
+    def test_admin_reads_from_the_primary(self):
+        admin = get_user_model().objects.create_superuser(username='admin', password='admin61700250185')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = self.client.get(reverse('admin:product_product_change', args=[self.product.id]))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # a session keeps the API on the primary too
+            self.client.get(reverse('cart:api:order_list'), HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(REPLICA_DATABASES=())
+    def test_nothing_is_routed_without_replicas(self):
+        self.assertEqual(self.replica_queries('get', 'cart:api:order_list'), 0)
+        self.replica_queries('post', 'cart:api:add_or_remove_from_cart', {'product': self.product.id})
+        self.assertFalse(is_pinned(self.user.id))
+
+    def test_writes_are_not_routed(self):
+        self.assertEqual(self.replica_queries('post', 'cart:api:add_or_remove_from_cart', {'product': self.product.id}), 0)
+
+    @patch('cart.models.cart.is_between', return_value=True)
+    def test_user_reads_from_the_primary_after_finalizing(self, mock_is_between):
+        address = Address.objects.create(user=self.user, province='Tehran', city='tehran', address='somewhere')
+        Shipping.objects.create(type='regular', price=10000)
+        Shipping.objects.create(type='express', price=20000)
+        self.user.get_initial_cart().add_items({self.product.id: 1})
+        self.replica_queries('post', 'cart:api:finalize_cart', {'address': address.id})
+        self.assertTrue(is_pinned(self.user.id))
+        self.assertEqual(self.replica_queries('get', 'cart:api:order_list'), 0)
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.post(reverse('cart:api:finalize_cart'), {}, HTTP_AUTHORIZATION=self.token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(is_pinned(self.user.id))
+
+    def test_async_views(self):
+        async def request(method, name, **kwargs):
+            return await getattr(self.async_client, method)(reverse(name), authorization=self.token, **kwargs)
+
+        # driven from this thread, so the views' database work runs on its connections
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = async_to_sync(request)('get', 'cart:api:async_order_list')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(len(queries), 0)
+        response = async_to_sync(request)('post', 'cart:api:async_add_to_cart', data={'product': self.product.id},
+                                           content_type='application/json')
+        self.assertLess(response.status_code, 400)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            async_to_sync(request)('get', 'cart:api:async_order_list')
+        self.assertEqual(len(queries), 0)
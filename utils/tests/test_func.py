@@ -0,0 +1,28 @@
+import random
+from datetime import datetime, timedelta
+
+import pytz
+from django.test import SimpleTestCase
+from khayyam import JalaliDatetime
+
+from utils.func import PersianDateTime
+
+
+def reference_persian_datetime(date: datetime) -> str:
+    # the original implementation of PersianDateTime
+    return str(JalaliDatetime(date.astimezone(tz=pytz.timezone('Asia/Tehran'))))
+
+
+class PersianDateTimeTest(SimpleTestCase):
+
+    def test_same_output_as_khayyam(self):
+        rnd = random.Random(1401)
+        start = datetime(2015, 1, 1, tzinfo=pytz.utc)
+        values = [start + timedelta(seconds=rnd.randrange(400_000_000), microseconds=rnd.randrange(1_000_000))
+                  for _ in range(2000)]
+        # around the daylight saving changes of Tehran (until 2022) and new year
+        values += [datetime(2021, 3, 21, 20, 29, 59, tzinfo=pytz.utc) + timedelta(seconds=i) for i in range(3)]
+        values += [datetime(2021, 9, 21, 19, 29, 59, tzinfo=pytz.utc) + timedelta(seconds=i) for i in range(3)]
+        values.append(datetime(2022, 7, 15, 11, 12, 13, tzinfo=pytz.FixedOffset(120)))
+        for value in values:
+            self.assertEqual(PersianDateTime(value), reference_persian_datetime(value))
@@ -0,0 +1,116 @@
+import threading
+
+import psycopg2
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from utils.pooled_postgresql.base import get_pool
+from utils.pooled_postgresql.pool import ConnectionPool, PoolTimeout
+
+
+class ConnectionPoolTest(TransactionTestCase):
+
+    def connect(self):
+        raw = psycopg2.connect(**connection.get_connection_params())
+        raw.autocommit = True
+        self.opened.append(raw)
+        return raw
+
+    def setUp(self):
+        self.opened = []
+        self.addCleanup(lambda: [raw.close() for raw in self.opened])
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(max_size=2)
+        raw = pool.getconn(self.connect)
+        pool.putconn(raw)
+        self.assertIs(pool.getconn(self.connect), raw)
+        self.assertEqual(pool.stats()['opened'], 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_size_is_bounded(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        pool.getconn(self.connect)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(self.connect)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_waiter_gets_the_connection_given_back(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        raw = pool.getconn(self.connect)
+        timer = threading.Timer(0.05, pool.putconn, args=(raw,))
+        timer.start()
+        self.assertIs(pool.getconn(self.connect), raw)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_time_max_ms'], 0)
+        self.assertEqual(stats['waiting'], 0)
+
+    def test_dead_connection_is_replaced_on_checkout(self):
+        pool = ConnectionPool(max_size=1, check_idle_after=0)
+        raw = pool.getconn(self.connect)
+        pool.putconn(raw)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [raw.get_backend_pid()])
+        replacement = pool.getconn(self.connect)
+        self.assertIsNot(replacement, raw)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_open_transaction_is_rolled_back(self):
+        pool = ConnectionPool(max_size=1)
+        raw = pool.getconn(self.connect)
+        raw.autocommit = False
+        raw.cursor().execute('SELECT 1')
+        pool.putconn(raw)
+        self.assertEqual(raw.get_transaction_status(), psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+        self.assertIs(pool.getconn(self.connect), raw)
+
+    def test_forked_child_does_not_reuse_the_parent_connections(self):
+        pool = ConnectionPool(max_size=1)
+        raw = pool.getconn(self.connect)
+        pool.putconn(raw)
+        pool.pid = -1  # as if this process had been forked from the one that opened it
+        self.assertIsNot(pool.getconn(self.connect), raw)
+        self.assertFalse(raw.closed)
+
+    def test_django_connection_goes_back_to_the_pool(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        self.assertFalse(raw.closed)
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
+        self.assertGreaterEqual(get_pool(connection).stats()['in_use'], 1)
+
+    def test_connection_closed_in_atomic_block_is_not_reused(self):
+        pool = get_pool(connection)
+        with transaction.atomic():
+            raw = connection.connection
+            discarded = pool.stats()['discarded']
+            connection.close()
+            self.assertTrue(raw.closed)
+            self.assertEqual(pool.stats()['discarded'], discarded + 1)
+        connection.ensure_connection()
+        self.assertIsNot(connection.connection, raw)
+
+
+class DatabasePoolStatsTest(APITestCase):
+
+    def test_stats_for_admins_only(self):
+        user = get_user_model().objects.create_user(username='mahsa', password='mah61700250185')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(reverse('db_pool_stats')).status_code, status.HTTP_403_FORBIDDEN)
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data[f'default:{connection.settings_dict["NAME"]}']
+        self.assertGreaterEqual(stats['in_use'], 1)
+        self.assertEqual(stats['max_size'], 20)
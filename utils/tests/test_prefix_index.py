@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase
+
+from utils.prefix_index import PrefixIndex
+
+
+class PrefixIndexTest(SimpleTestCase):
+    rows = [
+        (1, ('گوشی موبایل سامسونگ', 'گوشی-موبايل')),
+        (2, ('قاب گوشی', 'قاب')),
+        (3, ('Galaxy Buds', 'galaxy-buds')),
+    ]
+
+    def test_search(self):
+        index = PrefixIndex()
+        index.build(self.rows)
+        self.assertEqual(index.search('گوشی', 10), [2, 1])
+        self.assertEqual(index.search('سامس', 10), [1])
+        self.assertEqual(index.search('  GAL', 10), [3])
+        self.assertEqual(index.search('موبایل', 10), [1])
+        self.assertEqual(index.search('ق', 1), [2])
+        self.assertEqual(index.search('', 10), [])
+
+    def test_incremental_updates_match_a_full_build(self):
+        index = PrefixIndex()
+        index.build(self.rows[:1])
+        index.add(3, ('Galaxy', 'galaxy'))
+        index.add(2, self.rows[1][1])
+        index.add(3, self.rows[2][1])
+        index.add(4, ('هندزفری', 'handsfree'))
+        index.remove(4)
+        index.remove(5)
+        expected = PrefixIndex()
+        expected.build(self.rows)
+        self.assertEqual(index.keys, expected.keys)
+        self.assertEqual(index.ids, expected.ids)
+        self.assertEqual(index.stats()['items'], 3)